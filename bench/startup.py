@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+"""
+Startup benchmark:  measure the import time of each ebe-* executable and check
+it against a budget.
+
+The executables are launched very many times, e.g. once per event file in a
+batch campaign, so their startup time matters.  Each one is run with --help
+under `python -X importtime`, which imports everything the executable imports
+at startup but does no work.  The import times of the top-level modules are
+summed; the best of several runs is compared to the budget.
+
+Heavy optional modules, i.e. SciPy and Matplotlib, must never be imported at
+startup; they belong inside the functions which need them.
+
+Exits with status 1 if any executable is over budget or imports a forbidden
+module.  Budgets are for a typical desktop; use --scale on slower machines.
+"""
+
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+# import time budgets in ms
+# NumPy alone accounts for most of this
+BUDGETS = {
+    'ebe-read': 150,
+    'ebe-flows': 150,
+    'ebe-multiplicity': 150,
+    'ebe-index': 150,
+    'ebe-merge': 150,
+    'ebe-run': 150,
+    'ebe-fit': 150,
+    'ebe-fit-atlas': 150,
+    'ebe-unfold': 150,
+    'ebe-serve': 150,
+}
+
+# modules which must not be imported at startup
+FORBIDDEN = ('scipy','matplotlib')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(script):
+    """
+    Run an executable with -X importtime and parse the output.
+
+    Returns
+    -------
+    total import time of top-level modules in ms, set of imported modules
+
+    """
+
+    # allow the bytecode cache, else every run recompiles
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE',None)
+
+    proc = subprocess.run(
+        [sys.executable,'-X','importtime',os.path.join(ROOT,script),'--help'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env,
+        universal_newlines=True, check=True)
+
+    total = 0
+    modules = set()
+
+    # lines are 'import time: self [us] | cumulative | name', where the
+    # name is indented according to the import depth
+    for l in proc.stderr.splitlines():
+        if not l.startswith('import time:'):
+            continue
+
+        try:
+            _,cumulative,name = l[12:].split('|')
+            cumulative = int(cumulative)
+        except ValueError:
+            # header
+            continue
+
+        modules.add(name.strip())
+        if not name.startswith('  '):
+            total += cumulative
+
+    return total/1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='''Measure the import time of
+        the ebe-* executables and check it against a budget.''')
+
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+        help='Number of runs per executable; the best is used.  Default: 5.')
+    parser.add_argument('-s', '--scale', type=float, default=1.,
+        help='Multiply all budgets by this factor.  Default: 1.')
+    parser.add_argument('scripts', nargs='*', default=sorted(BUDGETS),
+        help='Executables to benchmark.  Default: all.')
+
+    args = parser.parse_args()
+
+
+    failed = False
+
+    for script in args.scripts:
+        runs = [import_times(script) for _ in range(args.repeat)]
+        best = min(t for t,_ in runs)
+        budget = args.scale*BUDGETS[script]
+
+        forbidden = sorted(m for m in runs[0][1]
+                           if m.split('.')[0] in FORBIDDEN)
+
+        status = 'ok'
+        if best > budget:
+            status = 'OVER BUDGET'
+        if forbidden:
+            status = 'FORBIDDEN: ' + ' '.join(m for m in forbidden
+                                              if '.' not in m)
+
+        failed |= status != 'ok'
+
+        print('{:18} {:7.1f} ms  (budget {:.0f})  {}'.format(
+            script,best,budget,status))
+
+    sys.exit(failed)
+
+
+if __name__ == "__main__":
+    main()
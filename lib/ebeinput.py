@@ -2,7 +2,8 @@
 Read event-by-event data via generators.
 
 The lowest-level generator is lines(), which yields lines from stdin, a single
-file, or multiple files in sequence.
+file, or multiple files in sequence.  Its counterpart blocks() yields large
+blocks of complete lines for vectorized parsing.
 
 In the middle are the particle generators particles_from_<format>(), which read
 lines and yield Particle objects.  They also yield None to separate events.
@@ -12,23 +13,90 @@ particle generators and yields lists of Particle objects, i.e. "events".  It
 depends on the particle generators yielding None to know when to separate
 events.
 
+In columnar mode, events_from_files() instead yields ParticleArray objects,
+i.e. events stored as contiguous NumPy arrays.  These come from the array
+generators arrays_from_<format>(), which yield one ParticleArray per event.
+
 All generators take filenames as their primary arguments.
 
 This module is called 'ebeinput' to avoid conflicts with the builtin input().
 """
 
 
+from functools import partial
+import io
+import itertools
+import warnings
+
+import numpy as np
+
 from .particle import *
 
 
+# compression formats by magic bytes
+_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'\xfd7zXZ\x00': 'xz',
+    b'BZh': 'bz2',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+# external decompressors in order of preference, writing to stdout
+# multithreaded where possible; all run in parallel with parsing
+_DECOMPRESSORS = {
+    'gzip': (['pigz','-dc'],),
+    'xz': (['xz','-dc','-T0'],),
+    'bz2': (['lbzip2','-dc'],['pbzip2','-dc']),
+    'zstd': (['zstd','-dcq'],),
+}
+
+
+def detect_compression(file):
+    """
+    Detect the compression format of a file from its magic bytes.
+
+    Arguments
+    ---------
+    file -- filename, or binary file object with a peek() method; no input is
+            consumed
+
+    Returns
+    -------
+    'gzip', 'xz', 'bz2', 'zstd', or None if not compressed
+
+    """
+
+    size = max(map(len,_MAGIC))
+
+    if isinstance(file,str):
+        with open(file,'rb') as f:
+            head = f.read(size)
+    else:
+        try:
+            head = file.peek(size)
+        except AttributeError:
+            return None
+
+    for magic,fmt in _MAGIC.items():
+        if head.startswith(magic):
+            return fmt
+
+    return None
+
+
 def open_compressed(filename,mode='rb'):
     """
-    Open a file for reading with automatic decompression.  Detects gzip, xz, and
-    bz2 files via the file extension.
+    Open a file for reading with automatic decompression.  Detects gzip, xz,
+    bz2, and zstd files via their magic bytes, regardless of the filename.
+
+    Compressed files are decompressed by an external program if available
+    (see _DECOMPRESSORS), which runs in parallel with parsing, else by the
+    standard library.
 
     Arguments
     ---------
-    filename to open
+    filename to open, or an open binary file object, e.g. stdin, which is
+    returned as is unless it is compressed
 
     Returns
     -------
@@ -36,19 +104,166 @@ def open_compressed(filename,mode='rb'):
 
     """
 
-    ext = filename.split('.')[-1]
+    fmt = detect_compression(filename)
+
+    if fmt is None:
+        return open(filename,mode) if isinstance(filename,str) else filename
+
+    for command in _DECOMPRESSORS[fmt]:
+        if _which(command[0]):
+            return io.BufferedReader(_Decompressor(command,filename),2**20)
 
-    if ext == 'gz':
+    if fmt == 'gzip':
         import gzip
         return gzip.open(filename,mode)
-    elif ext == 'xz':
+    elif fmt == 'xz':
         import lzma
         return lzma.open(filename,mode)
-    elif ext == 'bz2':
+    elif fmt == 'bz2':
         import bz2
         return bz2.open(filename,mode)
     else:
-        return open(filename,mode)
+        try:
+            # python >= 3.14
+            from compression import zstd
+        except ImportError:
+            raise OSError('cannot decompress zstd:  zstd program not found')
+        return zstd.open(filename,mode)
+
+
+def _is_compressed(filename):
+    """ Determine whether open_compressed() would decompress a file. """
+
+    try:
+        return detect_compression(filename) is not None
+    except OSError:
+        return False
+
+
+_stdin_stream = None
+
+def _stdin():
+    """
+    Binary stdin, decompressed if necessary.  Always returns the same stream,
+    which supports peek(), so that the input can be inspected (e.g. for the
+    format) before reading.
+
+    """
+
+    global _stdin_stream
+
+    if _stdin_stream is None:
+        import sys
+        _stdin_stream = open_compressed(sys.stdin.buffer)
+
+    return _stdin_stream
+
+
+_found = {}
+
+def _which(program):
+    # cache lookups of external programs
+    try:
+        return _found[program]
+    except KeyError:
+        import shutil
+        _found[program] = shutil.which(program)
+        return _found[program]
+
+
+class _Decompressor(io.RawIOBase):
+    """
+    Output of an external decompressor, read through a pipe.  A filename is
+    passed to the program directly; a file object is fed to its stdin by a
+    thread.  Seeking forward is supported (by reading), so that indexed
+    events can be reached without parsing.  Wrap in io.BufferedReader for line
+    iteration.
+
+    """
+
+    def __init__(self,command,source):
+        import subprocess
+
+        self._command = command
+        self._pos = 0
+
+        if isinstance(source,str):
+            # don't let filenames be mistaken for options
+            if source.startswith('-'):
+                source = './' + source
+
+            self._proc = subprocess.Popen(command + [source], bufsize=0,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        else:
+            self._proc = subprocess.Popen(command, bufsize=0,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE)
+
+            import threading
+            threading.Thread(target=self._feed, args=(source,),
+                             daemon=True).start()
+
+    def _feed(self,f):
+        import shutil
+
+        try:
+            shutil.copyfileobj(f,self._proc.stdin,2**20)
+        except (BrokenPipeError,ValueError):
+            # the program exited or was closed early
+            pass
+        finally:
+            try:
+                self._proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self,b):
+        n = self._proc.stdout.readinto(b)
+
+        if not n:
+            # end of output, check for errors
+            if self._proc.wait():
+                raise OSError('{} failed: {}'.format(
+                    self._command[0],
+                    self._proc.stderr.read().decode(errors='replace').strip()))
+
+        self._pos += n
+        return n
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self,offset,whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('can only seek from start or current')
+
+        if offset < self._pos:
+            raise io.UnsupportedOperation('cannot seek backwards in a pipe')
+
+        buf = bytearray(2**20)
+        while self._pos < offset:
+            if not self.readinto(memoryview(buf)[:offset-self._pos]):
+                break
+
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc.wait()
+            self._proc.stdout.close()
+            self._proc.stderr.close()
+
+        super().close()
 
 
 def lines(files=None):
@@ -72,10 +287,8 @@ def lines(files=None):
     """
 
     if not files or files == '-':
-        # read from stdin
-        # detach to read in binary mode
-        import sys
-        yield from sys.stdin.detach()
+        # read from stdin in binary mode
+        yield from _stdin()
 
     elif isinstance(files,str):
         # just one file
@@ -89,6 +302,63 @@ def lines(files=None):
                 yield from f
 
 
+def blocks(files=None,size=2**22):
+    """
+    Read large blocks of complete lines from files or stdin.
+
+    Like lines(), but yields many lines at once for vectorized parsing.  Every
+    block ends with a newline; if the last line of a file is unterminated, a
+    newline is appended so that lines never run together across files.
+
+    Arguments
+    ---------
+    files -- same as for lines()
+    size -- approximate block size in bytes [optional, default 4 MiB]
+
+    Yields
+    ------
+    blocks -- as bytes objects
+
+    """
+
+    if not files or files == '-':
+        # read from stdin
+        yield from _read_blocks(_stdin(),size)
+
+    elif isinstance(files,str):
+        # just one file
+        with open_compressed(files) as f:
+            yield from _read_blocks(f,size)
+
+    else:
+        # several files
+        for fn in files:
+            with open_compressed(fn) as f:
+                yield from _read_blocks(f,size)
+
+
+def _read_blocks(f,size):
+    # carry any incomplete line over to the next block
+    rest = b''
+
+    while True:
+        block = f.read(size)
+
+        if not block:
+            break
+
+        # split at the last newline
+        block = rest + block
+        n = block.rfind(b'\n') + 1
+        rest = block[n:]
+
+        if n:
+            yield block[:n]
+
+    if rest:
+        yield rest + b'\n'
+
+
 # dictionary to convert from urqmd ityp and 2*I3 to monte carlo ID
 # adapted from ityp2pdg.f in the urqmd source
 # structure is ityp:{2i3:mcid}
@@ -214,10 +484,112 @@ _urqmd_particle_dict = {
 }
 
 
+# dense table to convert from urqmd ityp and 2*I3 to monte carlo ID
+# built from the dictionary above, indexed by [abs(ityp),sign*2i3 + offset]
+# unknown combinations are marked by the sentinel ID 0
+_URQMD_ISO_OFFSET = 3
+_urqmd_id_table = np.zeros(
+    (max(_urqmd_particle_dict)+1, 2*_URQMD_ISO_OFFSET+1), dtype=int)
+
+for _ityp,_isos in _urqmd_particle_dict.items():
+    for _iso,_ID in _isos.items():
+        _urqmd_id_table[_ityp,_iso+_URQMD_ISO_OFFSET] = _ID
+
+del _ityp,_isos,_iso,_ID
+
+# nested lists are faster than numpy for scalar lookups
+_urqmd_id_list = _urqmd_id_table.tolist()
+
+
+def urqmd_id(ityp,iso):
+    """
+    Convert a single UrQMD ityp and 2*I3 to a monte carlo ID.
+
+    Arguments
+    ---------
+    ityp,iso -- integers
+
+    Returns
+    -------
+    ID -- integer, 0 if the species is unknown
+
+    """
+
+    # determine if particle or antiparticle via sign of ityp
+    sign = 1 if ityp > 0 else -1
+
+    row = sign*ityp
+    col = sign*iso + _URQMD_ISO_OFFSET
+
+    if row < len(_urqmd_id_list) and 0 <= col <= 2*_URQMD_ISO_OFFSET:
+        return sign * _urqmd_id_list[row][col]
+    else:
+        return 0
+
+
+def urqmd_ids(ityp,iso):
+    """
+    Convert arrays of UrQMD ityp and 2*I3 to monte carlo IDs via a single
+    fancy-index lookup.
+
+    Arguments
+    ---------
+    ityp,iso -- integer arrays
+
+    Returns
+    -------
+    ID -- integer array, 0 where the species is unknown
+
+    """
+
+    ityp = np.asarray(ityp)
+    iso = np.asarray(iso)
+
+    # determine if particle or antiparticle via sign of ityp
+    sign = np.where(ityp > 0, 1, -1)
+
+    row = sign*ityp
+    col = sign*iso + _URQMD_ISO_OFFSET
+
+    nrows,ncols = _urqmd_id_table.shape
+    known = (row < nrows) & (col >= 0) & (col < ncols)
+
+    if known.all():
+        return sign * _urqmd_id_table[row,col]
+    else:
+        ID = np.zeros_like(row)
+        ID[known] = _urqmd_id_table[row[known],col[known]]
+        return sign * ID
+
+
+def _warn_unknown(unknown):
+    """
+    Report particles of unknown UrQMD species.
+
+    Arguments
+    ---------
+    unknown -- collections.Counter of (ityp,2*I3) pairs
+
+    """
+
+    if unknown:
+        warnings.warn(
+            '{} UrQMD particle(s) of unknown species (ityp,2*I3) were '
+            'assigned ID 0: {}'.format(
+                sum(unknown.values()),
+                ', '.join('({},{}) x{}'.format(*k,n)
+                          for k,n in sorted(unknown.items()))
+            ),
+            stacklevel=3)
+
+
 def particles_from_urqmd(files=None):
     """
     Generate Particle objects from UrQMD files.  Yield None to separate events.
 
+    Particles of unknown species are assigned ID 0; a warning reports how many
+    were found once the files are exhausted.
+
     Arguments
     ---------
     files -- list of filenames to read
@@ -228,12 +600,16 @@ def particles_from_urqmd(files=None):
 
     """
 
+    from collections import Counter
     from math import sqrt, atan2, log
 
     # use this boolean to keep track of event headers
     # files should begin with a header
     header = True
 
+    # count particles of unknown species
+    unknown = Counter()
+
 
     for l in lines(files):
         # try to extract necessary values
@@ -267,9 +643,10 @@ def particles_from_urqmd(files=None):
             if header:
                 header = False
 
-            # determine if particle or antiparticle via sign of ityp
-            # about 5x faster than int(copysign(1,ityp))
-            sign = 1 if ityp > 0 else -1
+            # monte carlo ID
+            ID = urqmd_id(ityp,iso)
+            if not ID:
+                unknown[ityp,iso] += 1
 
             # magnitude of momentum vector
             pmag = sqrt(px*px + py*py + pz*pz)
@@ -278,12 +655,14 @@ def particles_from_urqmd(files=None):
             # this is a little ugly but it's faster than pre-calculating and
             # storing in four temporary objects
             yield Particle(
-                sign * _urqmd_particle_dict[abs(ityp)][sign*iso],   # ID
+                ID,   # ID
                 sqrt(px*px + py*py),   # pT
                 atan2(py,px),   # phi
                 0.5*log((pmag+pz)/max(pmag-pz,1e-10))   # eta
             )
 
+    _warn_unknown(unknown)
+
 
 def particles_from_oscar(files=None):
     """
@@ -371,37 +750,1529 @@ def particles_from_std(files=None):
             yield Particle( int(ID), float(pT), float(phi), float(eta) )
 
 
-# available input formats
-INPUT_FORMATS = ['auto','std','urqmd','oscar']
+def _arrays_from_particles(particles):
+    """
+    Generate ParticleArrays from an iterable of Particles separated by None.
+    Generic fallback for formats without a dedicated array generator.
+
+    """
+
+    event = []
+
+    for p in particles:
+        if p:
+            event.append(p)
+        elif event:
+            yield ParticleArray.from_particles(event)
+            event = []
+
+    if event:
+        yield ParticleArray.from_particles(event)
 
 
-def events_from_files(files=None,inputformat='auto',**kwargs):
+def _arrays_from_blocks(files,parse,scan):
     """
-    Generate events (lists of particles) by splitting an iterable of particles
-    into sublists.
+    Generate ParticleArrays by parsing blocks of lines.
+
+    An event which spans many blocks is collected and parsed once it ends,
+    rather than reparsed with every block, so the time is linear in the event
+    size.
+
+    Arguments
+    ---------
+    files -- list of filenames to read
+    parse -- function (data,final) -> (events,rest), where events is a list of
+             ParticleArrays and rest is any trailing event which may continue
+             in the next block
+    scan -- function (data,buf,newlines) -> boolean array, whether each line
+            is a particle [see _index_lines]
+
+    """
+
+    # pieces of the trailing event which may continue in the next block
+    rest = []
+    size = 0
+
+    for block in blocks(files):
+        if size > len(block) and _continues(block,scan):
+            rest.append(block)
+            size += len(block)
+            continue
+
+        events,tail = parse(b''.join(rest) + block)
+        yield from events
+
+        rest = [tail]
+        size = len(tail)
+
+    if size:
+        events,_ = parse(b''.join(rest),final=True)
+        yield from events
+
+
+def _continues(block,scan):
+    """
+    Determine whether every line of a block is a particle, i.e. whether an
+    event which continues into the block also continues through it.  Only
+    used when the trailing event is larger than the block, to avoid rescanning
+    it.
+
+    """
+
+    buf = np.frombuffer(block, dtype=np.uint8)
+
+    return scan(block,buf,np.flatnonzero(buf == 10)).all()
+
+
+def _split_lines(newlines,good,final):
+    """
+    Determine which lines in a buffer belong to complete events.
+
+    Arguments
+    ---------
+    newlines -- byte offsets of the newline at the end of each line
+    good -- boolean array, whether each line is a particle
+    final -- boolean, whether buf is the end of input
+
+    Returns
+    -------
+    end -- number of lines in complete events;
+           everything after the last non-particle line may continue in the next
+           buffer, unless final
+    stop -- byte offset of the end of line number end
+    runs -- (N,2) array of [start,stop) line numbers for each event
+
+    """
+
+    if final:
+        end = len(good)
+    else:
+        bad = np.flatnonzero(~good)
+        end = bad[-1] + 1 if bad.size else 0
+
+    stop = newlines[end-1] + 1 if end else 0
+
+    # runs of consecutive particle lines are events
+    edges = np.diff(good[:end], prepend=False, append=False)
+    runs = np.flatnonzero(edges).reshape(-1,2)
+
+    return end,stop,runs
+
+
+def arrays_from_urqmd(files=None):
+    """
+    Generate ParticleArrays from UrQMD files, one per event.
+
+    UrQMD records are fixed-width, so the momentum and ityp/iso columns are
+    extracted from all particle lines in a block at once by fancy-indexing the
+    raw bytes.  The standard quantities are then calculated with NumPy ufuncs.
+    Event boundaries and the treatment of unknown species are identical to
+    particles_from_urqmd().
 
     Arguments
     ---------
     files -- list of filenames to read
-    inputformat -- one of 'auto', 'std', 'urqmd'
-    kwargs -- for particle_filter
 
     Yields
     ------
-    events [i.e. sublists of Particles]
+    ParticleArray
 
     """
 
-    assert inputformat in INPUT_FORMATS
+    from collections import Counter
 
-    # autodetect input format
-    # very simple:  if '.f13' is in the first filename, set format to urqmd
-    # else set to std
-    if inputformat == 'auto':
-        if files and ('.f13' in files or '.f13' in files[0]):
-            inputformat = 'urqmd'
-        else:
-            inputformat = 'std'
+    # count particles of unknown species
+    unknown = Counter()
+
+    yield from _arrays_from_blocks(files,partial(_parse_urqmd,unknown=unknown),
+                                   _scan_urqmd)
+
+    _warn_unknown(unknown)
+
+
+# byte offsets of the fixed-width UrQMD fields used by particles_from_urqmd()
+_urqmd_p_cols = np.arange(121,192)
+_urqmd_ityp_cols = np.arange(218,221)
+_urqmd_iso_cols = np.arange(222,224)
+
+
+def _parse_urqmd(data,final=False,unknown=None):
+    """
+    Parse a buffer of complete UrQMD lines.  Same interface as _parse_std(),
+    plus a collections.Counter which is updated with (ityp,2*I3) pairs of
+    unknown species.
+
+    """
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+
+    newlines = np.flatnonzero(buf == 10)
+    linestarts = np.concatenate(([0], newlines[:-1] + 1))
+
+    # particle lines must be long enough to contain all fields
+    # shorter lines are headers
+    good = newlines - linestarts >= _urqmd_iso_cols[-1]
+
+    columns = _urqmd_columns(buf,linestarts[good])
+
+    if columns is None:
+        # some long lines are not particles => check them individually
+        lines = data.split(b'\n')
+        for k in np.flatnonzero(good):
+            good[k] = _urqmd_line_ok(lines[k])
+
+        columns = _urqmd_columns(buf,linestarts[good])
+
+    end,stop,runs = _split_lines(newlines,good,final)
+
+    if not runs.size:
+        return [],data[stop:]
+
+    # number of particles in complete events
+    npart = np.count_nonzero(good[:end])
+    px,py,pz,ityp,iso = (c[:npart] for c in columns)
+
+    # monte carlo ID
+    ID = urqmd_ids(ityp,iso)
+
+    if unknown is not None and not ID.all():
+        idx = ID == 0
+        unknown.update(zip(ityp[idx].tolist(),iso[idx].tolist()))
+
+    # calculate the std. quantities
+    pT = np.sqrt(px*px + py*py)
+    phi = np.arctan2(py,px)
+    pmag = np.sqrt(px*px + py*py + pz*pz)
+    eta = 0.5*np.log((pmag+pz)/np.maximum(pmag-pz,1e-10))
+
+    # split into events
+    sections = np.cumsum(runs[:,1] - runs[:,0])[:-1]
+
+    events = [
+        ParticleArray(*cols) for cols in
+        zip(*(np.split(a,sections) for a in (ID,pT,phi,eta)))
+    ]
+
+    return events,data[stop:]
+
+
+def _urqmd_columns(buf,linestarts):
+    """
+    Extract momentum and ityp/iso columns from the UrQMD lines beginning at the
+    given byte offsets.
+
+    Returns
+    -------
+    px,py,pz,ityp,iso -- arrays, or None if any line cannot be parsed
+
+    """
+
+    n = linestarts.size
+
+    # momentum; separate fields with spaces and
+    # python doesn't understand fortran doubles, neither does numpy
+    p = buf[linestarts[:,np.newaxis] + _urqmd_p_cols]
+    p[p == ord('D')] = ord('E')
+    p[:,[23,47]] = ord(' ')
+    p = _fromstring(
+        np.column_stack((p,np.full(n,ord(' '),np.uint8))).tobytes())
+
+    # UrQMD ityp and 2*I3
+    ityp = _fixed_ints(buf[linestarts[:,np.newaxis] + _urqmd_ityp_cols])
+    iso = _fixed_ints(buf[linestarts[:,np.newaxis] + _urqmd_iso_cols])
+
+    if p is None or ityp is None or iso is None or p.size != 3*n:
+        return None
+
+    px,py,pz = p.reshape(-1,3).T
+
+    return px,py,pz,ityp,iso
+
+
+# whitespace allowed around fixed-width integers
+_blank = np.array(list(b' \t\r\n'), dtype=np.uint8)
+
+
+def _fixed_ints_ok(chars):
+    """
+    Determine which rows of a (N,width) uint8 array are valid fixed-width
+    integer fields.
+
+    """
+
+    isdigit = chars - ord('0') < 10
+    valid = isdigit | (chars == ord('-')) | (chars == ord('+')) | \
+        np.isin(chars,_blank)
+
+    return valid.all(axis=1) & isdigit.any(axis=1)
+
+
+def _fixed_ints(chars):
+    """
+    Convert a (N,width) uint8 array of fixed-width integer fields to an integer
+    array.  Return None if any field is not an integer.
+
+    """
+
+    if not np.all(_fixed_ints_ok(chars)):
+        return None
+
+    digits = chars - ord('0')
+    isdigit = digits < 10
+    minus = chars == ord('-')
+
+    # Horner's method over the field width
+    value = np.zeros(chars.shape[0], dtype=int)
+    for d,isd in zip(digits.T,isdigit.T):
+        value = np.where(isd, 10*value + d, value)
+
+    return np.where(minus.any(axis=1), -value, value)
+
+
+def _urqmd_line_ok(l):
+    """ Whether particles_from_urqmd() would parse a line as a particle. """
+
+    try:
+        p = l[121:192].replace(b'D',b'E')
+        float(p[0:23]), float(p[24:47]), float(p[48:71])
+        int(l[218:221]), int(l[222:224])
+    except ValueError:
+        return False
+    else:
+        return True
+
+
+def arrays_from_oscar(files=None):
+    """
+    Generate ParticleArrays from OSCAR files, one per event.
+
+    Arguments
+    ---------
+    files -- list of filenames to read
+
+    Yields
+    ------
+    ParticleArray
+
+    """
+
+    yield from _arrays_from_particles(particles_from_oscar(files))
+
+
+def arrays_from_std(files=None):
+    """
+    Generate ParticleArrays from files containing standard particle info, one
+    per event.
+
+    Input is read in large blocks of complete lines.  Each block is scanned for
+    event boundaries with NumPy and its particle lines are converted with a
+    single np.fromstring call, so no Python code runs per particle.  Most of
+    the time is spent in the float conversion itself, which costs about as
+    much as in particles_from_std(); the saving is mainly that no Particle
+    objects are created.  Event boundaries are identical to
+    particles_from_std():  any line which does not contain exactly four fields
+    separates events.
+
+    Arguments
+    ---------
+    files -- list of filenames to read
+
+    Yields
+    ------
+    ParticleArray
+
+    """
+
+    yield from _arrays_from_blocks(files,_parse_std,_scan_std)
+
+
+def _parse_std(data,final=False):
+    """
+    Parse a buffer of complete standard format lines.
+
+    The number of fields on each line is counted via a vectorized scan of the
+    raw bytes.  Lines with four fields are particles, all others separate
+    events.  Normally the only other lines are blank, in which case the entire
+    buffer is converted at once.
+
+    Arguments
+    ---------
+    data -- bytes, must end with a newline
+    final -- boolean, whether data is the end of input
+
+    Returns
+    -------
+    events -- list of ParticleArrays
+    rest -- bytes after the last event separator, i.e. an event which may not
+            be complete; empty if final
+
+    """
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == 10)
+
+    nfields = _count_fields(buf,newlines)
+    good = nfields == 4
+
+    end,stop,runs = _split_lines(newlines,good,final)
+
+    if not runs.size:
+        events = []
+
+    elif np.all(nfields[:end][~good[:end]] == 0):
+        # all separators are blank lines => convert everything at once
+        values = _std_values(data[:stop])
+        events = [_std_array(v) for v in
+                  np.split(values, np.cumsum(runs[:,1] - runs[:,0])[:-1])]
+
+    else:
+        # separators contain text => convert each event separately
+        linestarts = np.concatenate(([0], newlines[:end] + 1))
+        events = [
+            _std_array(_std_values(data[linestarts[i]:linestarts[j]]))
+            for i,j in runs
+        ]
+
+    return events,data[stop:]
+
+
+def _count_fields(buf,newlines):
+    """
+    Count whitespace-separated fields on each line of a buffer.
+
+    Arguments
+    ---------
+    buf -- uint8 array of complete lines
+    newlines -- byte offsets of the newline at the end of each line
+
+    Returns
+    -------
+    integer array, number of fields on each line
+
+    """
+
+    # treat all control bytes as whitespace, as bytes.split() does for \t\n etc.
+    space = buf <= 32
+
+    # fields begin at non-whitespace bytes preceded by whitespace
+    starts = ~space
+    starts[1:] &= space[:-1]
+
+    return np.diff(np.searchsorted(np.flatnonzero(starts),newlines), prepend=0)
+
+
+def _std_values(data):
+    """
+    Convert a buffer of standard format particle lines to a (N,4) array.
+
+    """
+
+    values = _fromstring(data)
+
+    if values is None or values.size % 4:
+        raise ValueError('invalid standard format particle data')
+
+    return values.reshape(-1,4)
+
+
+def _fromstring(data):
+    """
+    Convert a buffer of whitespace-separated numbers to a float array.  Return
+    None if the buffer contains anything else.
+
+    """
+
+    # depending on the numpy version, trailing unmatched data either raises
+    # ValueError or issues a DeprecationWarning and truncates the result
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            return np.fromstring(data, sep=' ')
+        except (ValueError,DeprecationWarning):
+            return None
+
+
+def _std_array(values):
+    """
+    Convert a (N,4) array of standard particle info to a ParticleArray.
+
+    """
+
+    return ParticleArray(
+        values[:,0].astype(int),
+        values[:,1].copy(),
+        values[:,2].copy(),
+        values[:,3].copy()
+    )
+
+
+"""
+Binary particle format.
+
+A stream begins with an 8-byte header:  the magic bytes BINARY_MAGIC, a version
+byte, the size in bytes of floating-point fields (4 or 8), and two padding
+bytes.  Each event is then a little-endian uint32 particle count followed by
+that many packed records (int32 ID, float pT, float phi, float eta).
+
+Streams may be concatenated, e.g. `cat a.bin b.bin`:  a particle count equal to
+the magic bytes (over 10^9 particles) is interpreted as a new header.
+
+"""
+
+BINARY_MAGIC = b'\x93EBE'
+BINARY_VERSION = 1
+
+
+def binary_header(floatsize=8):
+    """ Create a binary stream header for the given float size (4 or 8). """
+
+    assert floatsize in (4,8)
+
+    return BINARY_MAGIC + bytes((BINARY_VERSION,floatsize,0,0))
+
+
+def binary_dtype(floatsize=8):
+    """ Create the numpy record dtype for the given float size (4 or 8). """
+
+    f = '<f{}'.format(floatsize)
+
+    return np.dtype([('ID','<i4'), ('pT',f), ('phi',f), ('eta',f)])
+
+
+def is_binary(files=None):
+    """
+    Determine whether the first file (or stdin) begins with the binary magic
+    bytes.  Does not consume any input from stdin.
+
+    """
+
+    if not files or files == '-':
+        return _stdin().peek(len(BINARY_MAGIC)).startswith(BINARY_MAGIC)
+
+    if not isinstance(files,str):
+        files = files[0]
+
+    try:
+        with open_compressed(files) as f:
+            return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+    except OSError:
+        return False
+
+
+def arrays_from_binary(files=None):
+    """
+    Generate ParticleArrays from binary files, one per event.
+
+    Each event is read with a single read() call and converted without any
+    text parsing.
+
+    Arguments
+    ---------
+    files -- list of filenames to read
+
+    Yields
+    ------
+    ParticleArray
+
+    """
+
+    if not files or files == '-':
+        yield from _read_binary(_stdin())
+
+    elif isinstance(files,str):
+        with open_compressed(files) as f:
+            yield from _read_binary(f)
+
+    else:
+        for fn in files:
+            with open_compressed(fn) as f:
+                yield from _read_binary(f)
+
+
+def _read_binary(f):
+    """
+    Generate ParticleArrays from an open binary stream.
+
+    """
+
+    dtype = None
+
+    while True:
+        count = f.read(4)
+
+        if not count:
+            break
+
+        if count == BINARY_MAGIC:
+            # (new) stream header
+            version,floatsize = f.read(4)[:2]
+            if version != BINARY_VERSION:
+                raise ValueError(
+                    'unsupported binary format version {}'.format(version))
+            dtype = binary_dtype(floatsize)
+            continue
+
+        if dtype is None:
+            raise ValueError('binary stream does not begin with a header')
+
+        n = int.from_bytes(count, 'little')
+        records = np.frombuffer(f.read(n*dtype.itemsize), dtype=dtype)
+
+        if records.size != n:
+            raise ValueError('truncated binary event')
+
+        if n:
+            yield ParticleArray(
+                records['ID'].astype(int),
+                records['pT'].astype(float),
+                records['phi'].astype(float),
+                records['eta'].astype(float)
+            )
+
+
+def particles_from_binary(files=None):
+    """
+    Generate Particle objects from binary files.  Yield None to separate
+    events.
+
+    Arguments
+    ---------
+    files -- list of filenames to read
+
+    Yields
+    ------
+    Particle() or None
+
+    """
+
+    for event in arrays_from_binary(files):
+        yield from event
+        yield
+
+
+"""
+Columnar event store.
+
+A store is a directory of NumPy .npy files:  one array per column (ID.npy,
+pT.npy, phi.npy, eta.npy) holding all particles of all events back to back, and
+offsets.npy, the index of the first particle of each event plus the total
+number of particles.  Columns are read via memory maps, i.e. zero-copy and
+shared through the OS page cache by all processes reading the same store.
+
+Events are grouped into chunks of a fixed number of events.  zones.npz holds
+"zone maps" for each chunk:  the min/max of pT, eta, and |eta| and a bitmap of
+the species (|ID|) present.  When filtering, chunks which cannot contain any
+matching particles are skipped entirely.
+
+"""
+
+STORE_COLUMNS = ('ID','pT','phi','eta')
+
+
+def is_store(files=None):
+    """ Determine whether the first file is a columnar event store. """
+
+    import os.path
+
+    if not files or files == '-':
+        return False
+
+    if not isinstance(files,str):
+        files = files[0]
+
+    return os.path.isfile(os.path.join(files,'offsets.npy'))
+
+
+def arrays_from_store(files=None,events=None,**kwargs):
+    """
+    Generate ParticleArrays from columnar event stores, one per event.
+
+    The arrays are views into memory-mapped columns; no data is copied or
+    parsed.  If filtering criteria are given, chunks of events which cannot
+    contain any matching particles are skipped via the zone maps.  The events
+    are NOT filtered here, only skipped; the caller must still apply
+    particle_filter.
+
+    Arguments
+    ---------
+    files -- list of store directories to read
+    events -- slice of event numbers to read, counting across all stores
+              [optional, default all]
+    kwargs -- filtering criteria, as for particle_filter
+
+    Yields
+    ------
+    ParticleArray
+
+    """
+
+    import os.path
+
+    if isinstance(files,str):
+        files = [files]
+
+    start,stop = _slice_bounds(events)
+
+    # event number of the first event in the current store
+    first = 0
+
+    for path in files:
+        if first >= stop:
+            break
+
+        columns = [
+            np.load(os.path.join(path,c+'.npy'), mmap_mode='r').view(np.ndarray)
+            for c in STORE_COLUMNS
+        ]
+        offsets = np.load(os.path.join(path,'offsets.npy'))
+
+        with np.load(os.path.join(path,'zones.npz')) as zones:
+            chunksize = int(zones['chunksize'])
+            match = _zone_match(zones,**kwargs)
+
+        # range of events to read from this store
+        nevents = offsets.size - 1
+        a = max(start - first, 0)
+        b = min(stop - first, nevents)
+        first += nevents
+
+        for chunk in np.flatnonzero(match).tolist():
+            lo = max(chunk*chunksize, a)
+            hi = min((chunk+1)*chunksize, b)
+            bounds = offsets[lo:hi+1].tolist()
+            for i,j in zip(bounds[:-1],bounds[1:]):
+                yield ParticleArray(*(c[i:j] for c in columns))
+
+
+def _zone_match(zones,**kwargs):
+    """
+    Determine which chunks of a store may contain particles matching the
+    filtering criteria.  Criteria are interpreted as in particle_filter.
+
+    Arguments
+    ---------
+    zones -- mapping of zone map arrays
+    kwargs -- filtering criteria
+
+    Returns
+    -------
+    boolean array, one element per chunk
+
+    """
+
+    match = np.ones(zones['pTmin'].size, dtype=bool)
+
+    # species
+    ID = kwargs.get('ID',[])
+    charged = kwargs.get('charged',False)
+
+    if ID or charged:
+        if ID:
+            wanted = np.abs(ID)
+        else:
+            from . import pdg
+            wanted = np.fromiter(pdg.chargedIDs(), int)
+
+        species = np.isin(zones['species'],wanted)
+        bitmap = np.unpackbits(zones['bitmap'], axis=1,
+                               count=zones['species'].size).astype(bool)
+        match &= bitmap[:,species].any(axis=1)
+
+    # pT range
+    pTmin = kwargs.get('pTmin',None)
+    pTmax = kwargs.get('pTmax',None)
+
+    if pTmin:
+        match &= zones['pTmax'] > pTmin
+    if pTmax:
+        match &= zones['pTmin'] < pTmax
+
+    # eta range
+    etamin = kwargs.get('etamin',None)
+    etamax = kwargs.get('etamax',None)
+
+    if etamax and etamin:
+        match &= (zones['etamax'] > etamin) & (zones['etamin'] < etamax)
+    elif etamin and not etamax:
+        match &= zones['absetamax'] > etamin
+    elif etamax and not etamin:
+        match &= zones['absetamin'] < etamax
+
+    return match
+
+
+def particles_from_store(files=None):
+    """
+    Generate Particle objects from columnar event stores.  Yield None to
+    separate events.
+
+    Arguments
+    ---------
+    files -- list of store directories to read
+
+    Yields
+    ------
+    Particle() or None
+
+    """
+
+    for event in arrays_from_store(files):
+        yield from event
+        yield
+
+
+"""
+Event index.
+
+An index records the byte range and number of particles of each event in a
+file, for the std, urqmd, oscar, and binary formats.  Events are numbered from
+zero in file order; for several files, numbering continues across files.
+
+Indices are stored in a sidecar file next to the indexed file (see index_path)
+and are created by write_index() or the ebe-index tool.  They are used to read
+a slice of events without parsing the preceding ones (events_from_files with
+events=slice(start,stop)) and to split files into balanced shards for parallel
+workers (shards).
+
+Compressed files may be indexed; offsets then refer to the decompressed data.
+Seeking still requires decompressing the preceding data, but not parsing it.
+
+"""
+
+
+def index_path(filename):
+    """ Path of the sidecar index file for a given file. """
+
+    return filename + '.idx.npz'
+
+
+def build_index(filename,inputformat='auto'):
+    """
+    Scan a file and determine the byte range and number of particles of each
+    event.  Event boundaries are determined by the same rules as the
+    corresponding parsers, but the particle data is not converted.
+
+    Arguments
+    ---------
+    filename -- file to index
+    inputformat -- same as for events_from_files
+
+    Returns
+    -------
+    index -- dict of arrays:
+             starts,stops -- byte range of each event
+             counts -- number of particles in each event
+             floatsize -- float size of each event [binary format only]
+             and metadata:  format, size, mtime of the indexed file
+
+    """
+
+    import os
+
+    inputformat = detect_format(filename,inputformat)
+
+    with open_compressed(filename) as f:
+        if inputformat == 'binary':
+            index = _index_binary(f)
+        elif inputformat in _scanners:
+            index = _index_lines(f,_scanners[inputformat])
+        else:
+            raise ValueError('cannot index format ' + inputformat)
+
+    stat = os.stat(filename)
+    index.update(format=inputformat, size=stat.st_size, mtime=stat.st_mtime)
+
+    return index
+
+
+def write_index(filename,inputformat='auto'):
+    """
+    Build an index and save it to the sidecar file.  Returns the index.
+
+    """
+
+    index = build_index(filename,inputformat)
+
+    # write to a temporary file and rename to avoid partial indices
+    import os
+    tmp = index_path(filename) + '.tmp.npz'
+    np.savez(tmp,**index)
+    os.replace(tmp,index_path(filename))
+
+    return index
+
+
+def load_index(filename,inputformat='auto',build=True):
+    """
+    Load the sidecar index of a file.  The index is only used if the file has
+    not changed since it was indexed and was indexed as the same format, since
+    event boundaries depend on the format.
+
+    Arguments
+    ---------
+    filename -- indexed file
+    inputformat -- same as for events_from_files
+    build -- boolean, build the index (without saving) if there is no valid
+             sidecar [optional, default True]
+
+    Returns
+    -------
+    index dict, or None if there is no valid index and build is false
+
+    """
+
+    import os
+
+    inputformat = detect_format(filename,inputformat)
+
+    try:
+        with np.load(index_path(filename)) as f:
+            index = dict(f)
+    except OSError:
+        pass
+    else:
+        stat = os.stat(filename)
+        if index['size'] == stat.st_size and \
+                index['mtime'] == stat.st_mtime and \
+                str(index['format']) == inputformat:
+            return index
+
+    return build_index(filename,inputformat) if build else None
+
+
+def _index_lines(f,scan,size=2**22):
+    """
+    Index a text file.  Same logic as _arrays_from_blocks(), except the events
+    are located but not parsed.
+
+    Arguments
+    ---------
+    f -- open binary file object
+    scan -- function (data,buf,newlines) -> boolean array, whether each line
+            is a particle
+    size -- block size
+
+    """
+
+    starts = []
+    stops = []
+    counts = []
+
+    # byte offset of the start of the current buffer
+    pos = 0
+
+    # pieces of the trailing event which may continue in the next block
+    rest = []
+    restsize = 0
+
+    blocks = _read_blocks(f,size)
+
+    while True:
+        block = next(blocks,None)
+        final = block is None
+
+        # as in _arrays_from_blocks, do not rescan a large trailing event
+        if not final and restsize > len(block) and _continues(block,scan):
+            rest.append(block)
+            restsize += len(block)
+            continue
+
+        data = b''.join(rest) if final else b''.join(rest) + block
+
+        if not data:
+            break
+
+        buf = np.frombuffer(data, dtype=np.uint8)
+        newlines = np.flatnonzero(buf == 10)
+        good = scan(data,buf,newlines)
+
+        end,stop,runs = _split_lines(newlines,good,final)
+
+        linestarts = np.concatenate(([0], newlines[:-1] + 1))
+        starts.append(pos + linestarts[runs[:,0]])
+        stops.append(pos + newlines[runs[:,1]-1] + 1)
+        counts.append(runs[:,1] - runs[:,0])
+
+        if final:
+            break
+
+        pos += stop
+        rest = [data[stop:]]
+        restsize = len(rest[0])
+
+    return dict(
+        starts=np.concatenate(starts or [[]]).astype(np.int64),
+        stops=np.concatenate(stops or [[]]).astype(np.int64),
+        counts=np.concatenate(counts or [[]]).astype(np.int64)
+    )
+
+
+def _scan_std(data,buf,newlines):
+    """ Standard format particle lines have four fields. """
+
+    return _count_fields(buf,newlines) == 4
+
+
+def _scan_oscar(data,buf,newlines):
+    """ OSCAR particle lines have eleven fields. """
+
+    return _count_fields(buf,newlines) == 11
+
+
+# characters which may appear in UrQMD momentum fields
+_urqmd_p_chars = np.zeros(256, dtype=bool)
+_urqmd_p_chars[list(b' +-.0123456789DEde')] = True
+
+
+def _scan_urqmd(data,buf,newlines):
+    """
+    UrQMD particle lines are long enough to contain all fields, the momentum
+    fields are numeric, and ityp/iso are integers.
+
+    """
+
+    linestarts = np.concatenate(([0], newlines[:-1] + 1))
+
+    good = newlines - linestarts >= _urqmd_iso_cols[-1]
+
+    idx = linestarts[good][:,np.newaxis]
+    numeric = (
+        _urqmd_p_chars[buf[idx + _urqmd_p_cols]].all(axis=1) &
+        _fixed_ints_ok(buf[idx + _urqmd_ityp_cols]) &
+        _fixed_ints_ok(buf[idx + _urqmd_iso_cols])
+    )
+
+    if not numeric.all():
+        # check suspicious lines individually
+        lines = data.split(b'\n')
+        k = np.flatnonzero(good)
+        good[k[~numeric]] = [_urqmd_line_ok(lines[j]) for j in k[~numeric]]
+
+    return good
+
+
+_scanners = dict(std=_scan_std, urqmd=_scan_urqmd, oscar=_scan_oscar)
+
+
+def _index_binary(f):
+    """
+    Index a binary stream.  Only the particle counts are read; the records are
+    skipped by seeking.
+
+    """
+
+    starts = []
+    counts = []
+    floatsizes = []
+
+    pos = 0
+    itemsize = floatsize = None
+
+    while True:
+        count = f.read(4)
+
+        if not count:
+            break
+
+        if count == BINARY_MAGIC:
+            floatsize = f.read(4)[1]
+            itemsize = binary_dtype(floatsize).itemsize
+            pos += 8
+            continue
+
+        n = int.from_bytes(count,'little')
+
+        if n:
+            starts.append(pos)
+            counts.append(n)
+            floatsizes.append(floatsize)
+
+        pos += 4 + n*itemsize
+        f.seek(pos)
+
+    starts = np.array(starts, dtype=np.int64)
+    counts = np.array(counts, dtype=np.int64)
+    floatsizes = np.array(floatsizes, dtype=np.int64)
+
+    return dict(
+        starts=starts,
+        stops=starts + 4 + counts*(4 + 3*floatsizes),
+        counts=counts,
+        floatsize=floatsizes
+    )
+
+
+class _FileRange(io.RawIOBase):
+    """
+    Read-only view of a byte range of a file, optionally preceded by some
+    prefix bytes.  Wrap in io.BufferedReader for line iteration.
+
+    """
+
+    def __init__(self,filename,start,stop,prefix=b''):
+        self._f = open_compressed(filename)
+        self._f.seek(start)
+        self._left = stop - start
+        self._prefix = prefix
+
+    def readable(self):
+        return True
+
+    def readinto(self,b):
+        if self._prefix:
+            n = min(len(b),len(self._prefix))
+            b[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+
+        data = self._f.read(min(len(b),self._left))
+        n = len(data)
+        b[:n] = data
+        self._left -= n
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+def _slice_bounds(events):
+    """ Convert a slice of event numbers to start,stop.  Steps are not allowed. """
+
+    if events is None:
+        return 0,float('inf')
+
+    assert events.step in (None,1)
+
+    start = events.start or 0
+    stop = float('inf') if events.stop is None else events.stop
+
+    assert 0 <= start and 0 <= stop
+
+    return start,stop
+
+
+def _sliced_sources(files,inputformat,events):
+    """
+    Generate open file objects containing exactly the requested events, via
+    the file indices.  Files which are read to the end from their first event
+    are not indexed and are generated as filenames.
+
+    """
+
+    start,stop = _slice_bounds(events)
+
+    if isinstance(files,str):
+        files = [files]
+
+    # event number of the first event in the current file
+    first = 0
+
+    for fn in files:
+        if first >= stop:
+            break
+
+        # files read to the end from their first event need no index
+        if first >= start and stop == float('inf'):
+            yield fn
+            continue
+
+        index = load_index(fn,inputformat)
+        nevents = index['counts'].size
+
+        # range of events to read from this file
+        a = max(start - first, 0)
+        b = min(stop - first, nevents)
+        first += nevents
+
+        if a < b:
+            prefix = binary_header(int(index['floatsize'][a])) \
+                if inputformat == 'binary' else b''
+            yield io.BufferedReader(_FileRange(
+                fn, index['starts'][a], index['stops'][b-1], prefix))
+
+
+def shards(files,n,inputformat='auto'):
+    """
+    Split files into shards of consecutive events with approximately equal
+    numbers of particles, via the file indices.
+
+    Arguments
+    ---------
+    files -- list of filenames
+    n -- number of shards
+    inputformat -- same as for events_from_files
+
+    Returns
+    -------
+    list of slices of event numbers, suitable for events_from_files
+
+    """
+
+    if isinstance(files,str):
+        files = [files]
+
+    counts = np.concatenate([load_index(fn,inputformat)['counts'] for fn in files])
+    bounds = _balance(counts,n).tolist()
+
+    return [slice(a,b) for a,b in zip(bounds[:-1],bounds[1:])]
+
+
+def _balance(counts,n):
+    """
+    Split a sequence of events into n runs with approximately equal numbers of
+    particles.  Returns the n+1 boundary event numbers.
+
+    """
+
+    total = np.cumsum(counts)
+
+    # first event of each run
+    bounds = np.searchsorted(total, total[-1]*np.arange(1,n)/n, side='right') \
+        if total.size else np.zeros(n-1, dtype=int)
+
+    return np.concatenate(([0], bounds, [len(counts)]))
+
+
+def split_file(filename,inputformat,n):
+    """
+    Split an uncompressed text file into at most n byte ranges of similar size,
+    aligned to event boundaries.
+
+    Each range ends just after a non-particle line (a blank line, or a line
+    of an event header), so every event lies entirely within one range.  The
+    boundaries are found by scanning forward from equally spaced offsets; the
+    rest of the file is not read.
+
+    Arguments
+    ---------
+    filename -- name of an uncompressed std, UrQMD, or OSCAR file
+    inputformat -- 'std', 'urqmd', or 'oscar'
+    n -- maximum number of ranges
+
+    Returns
+    -------
+    list of (start,stop) byte offsets
+
+    """
+
+    import os
+
+    size = os.path.getsize(filename)
+    scan = _scanners[inputformat]
+
+    bounds = [0]
+
+    with open(filename,'rb') as f:
+        for k in range(1,n):
+            pos = _event_boundary(f,max(k*size//n,bounds[-1]),scan)
+
+            if pos >= size:
+                break
+
+            if pos > bounds[-1]:
+                bounds.append(pos)
+
+    bounds.append(size)
+
+    return list(zip(bounds[:-1],bounds[1:]))
+
+
+def _event_boundary(f,pos,scan,size=2**20):
+    """
+    Find the end of the first complete non-particle line at or after byte
+    offset pos.  Returns the end of the file if there is none.
+
+    """
+
+    f.seek(pos)
+    data = b''
+
+    while True:
+        block = f.read(size)
+
+        if not block:
+            return pos + len(data)
+
+        data += block
+        buf = np.frombuffer(data, dtype=np.uint8)
+        newlines = np.flatnonzero(buf == 10)
+
+        # the first line is probably incomplete, skip it
+        if newlines.size > 1:
+            first = newlines[0] + 1
+            good = scan(data[first:], buf[first:], newlines[1:] - first)
+            bad = np.flatnonzero(~good)
+
+            if bad.size:
+                return pos + newlines[bad[0]+1] + 1
+
+        # an event may be larger than the block, keep reading
+        size *= 2
+
+
+def _event_counts(filename,inputformat):
+    """ Number of events in a file (before filtering), via its index. """
+
+    if inputformat == 'store':
+        import os.path
+        return np.load(os.path.join(filename,'offsets.npy'), mmap_mode='r').size - 1
+    else:
+        return load_index(filename,inputformat)['counts'].size
+
+
+def _file_slices(files,inputformat,events):
+    """
+    Convert a slice of event numbers across all files to a slice for each
+    file.  Yields (filename,slice) for each file with requested events; the
+    slice is None for files which are read entirely.
+
+    """
+
+    if events is None:
+        yield from ((fn,None) for fn in files)
+        return
+
+    start,stop = _slice_bounds(events)
+
+    # event number of the first event in the current file
+    first = 0
+
+    for fn in files:
+        if first >= stop:
+            break
+
+        # files read to the end from their first event need no index
+        if first >= start and stop == float('inf'):
+            yield fn, None
+            continue
+
+        nevents = _event_counts(fn,inputformat)
+
+        a = max(start - first, 0)
+        b = min(stop - first, nevents)
+        first += nevents
+
+        if a < b:
+            yield fn, slice(a,b)
+
+
+# target size of the pieces of a file which are read in parallel
+# small enough that workers' results do not use excessive memory
+_PIECE_BYTES = 2**26
+_PIECE_PARTICLES = 2**21
+
+
+def _parallel_sources(files,inputformat,jobs,events):
+    """
+    Divide files into pieces for parallel reading.  Large files are split
+    into pieces of consecutive events, so that even a single file is read by
+    all workers.
+
+    Yields
+    ------
+    source,events -- where source is a filename or a tuple of arguments for
+                     _FileRange; events is a slice as for events_from_files
+
+    """
+
+    import os
+
+    for fn,sl in _file_slices(files,inputformat,events):
+        # compressed files cannot seek, stores are not parsed anyway
+        if inputformat == 'store' or _is_compressed(fn):
+            yield fn, sl
+
+        # text files are split at event boundaries without an index
+        elif sl is None and inputformat != 'binary':
+            n = max(jobs, -(-os.path.getsize(fn) // _PIECE_BYTES))
+            for start,stop in split_file(fn,inputformat,n):
+                yield (fn,start,stop), None
+
+        # otherwise the index has the event boundaries
+        else:
+            index = load_index(fn,inputformat)
+            a = 0 if sl is None else sl.start
+            counts = index['counts'] if sl is None else index['counts'][sl]
+
+            n = max(jobs, -(-int(counts.sum()) // _PIECE_PARTICLES))
+            bounds = (a + _balance(counts,n)).tolist()
+
+            for i,j in zip(bounds[:-1],bounds[1:]):
+                if i < j:
+                    prefix = binary_header(int(index['floatsize'][i])) \
+                        if inputformat == 'binary' else b''
+                    yield (fn,int(index['starts'][i]),
+                           int(index['stops'][j-1]),prefix), None
+
+
+def _read_packed(source,inputformat,events,kwargs):
+    """
+    Read and filter all events from a source (see _parallel_sources) in a
+    worker process.
+
+    Returns
+    -------
+    (ParticleArray,counts) -- all events concatenated and the event sizes;
+                              a few large arrays are much cheaper to send
+                              between processes than many small ones
+
+    """
+
+    if not isinstance(source,str):
+        source = io.BufferedReader(_FileRange(*source))
+
+    arrays = list(events_from_files([source],inputformat,columnar=True,
+                                    events=events,**kwargs))
+
+    return ParticleArray.concatenate(arrays), [len(e) for e in arrays]
+
+
+def _parallel_arrays(files,inputformat,jobs,events,kwargs):
+    """
+    Generate ParticleArrays from files, reading and filtering pieces of the
+    files in a pool of worker processes.  Events are yielded in input order.
+
+    """
+
+    import collections
+    import multiprocessing
+
+    work = _parallel_sources(files,inputformat,jobs,events)
+
+    # results waiting to be yielded, in input order
+    # the number of pieces in flight is limited so that fast workers cannot
+    # run arbitrarily far ahead of the consumer
+    pending = collections.deque()
+
+    with multiprocessing.Pool(jobs) as pool:
+        for source,sl in itertools.islice(work,2*jobs):
+            pending.append(pool.apply_async(_read_packed,
+                                            (source,inputformat,sl,kwargs)))
+
+        while pending:
+            array,counts = pending.popleft().get()
+
+            for source,sl in itertools.islice(work,1):
+                pending.append(pool.apply_async(_read_packed,
+                                                (source,inputformat,sl,kwargs)))
+
+            yield from array.split(counts)
+
+
+# available input formats
+INPUT_FORMATS = ['auto','std','urqmd','oscar','binary','store']
+
+
+def detect_format(files=None,inputformat='auto'):
+    """
+    Determine the input format of files.
+
+    Stores are directories and binary files are identified by their magic
+    bytes.  Otherwise, very simple:  if '.f13' is in the first filename, the
+    format is urqmd, else std.
+
+    Arguments
+    ---------
+    files -- list of filenames
+    inputformat -- one of INPUT_FORMATS; anything but 'auto' is returned as is
+
+    Returns
+    -------
+    input format
+
+    """
+
+    assert inputformat in INPUT_FORMATS
+
+    if inputformat != 'auto':
+        return inputformat
+
+    if is_store(files):
+        return 'store'
+    elif is_binary(files):
+        return 'binary'
+    elif files and ('.f13' in files or '.f13' in files[0]):
+        return 'urqmd'
+    else:
+        return 'std'
+
+
+def events_from_files(files=None,inputformat='auto',columnar=False,events=None,
+                      jobs=1,**kwargs):
+    """
+    Generate events (lists of particles) by splitting an iterable of particles
+    into sublists.
+
+    Arguments
+    ---------
+    files -- list of filenames to read
+    inputformat -- one of 'auto', 'std', 'urqmd', 'oscar', 'binary', 'store'
+    columnar -- boolean, yield ParticleArrays instead of lists of Particles
+    events -- slice(start,stop) of event numbers to read, counting from zero
+              across all files and before filtering; uses the file indices to
+              skip directly to the first event [optional, default all]
+    jobs -- number of worker processes; files, or pieces of large files,
+            are distributed among the workers and events are yielded in input
+            order [optional, default 1, i.e. read in this process]
+    kwargs -- for particle_filter
+
+    Yields
+    ------
+    events [i.e. sublists of Particles, or ParticleArrays if columnar]
+
+    """
+
+    inputformat = detect_format(files,inputformat)
+
+    # read files in parallel
+    # stdin is always read in this process
+    if isinstance(files,str) and files != '-':
+        files = [files]
+
+    if jobs > 1 and files and files != '-' and '-' not in files:
+        arrays = _parallel_arrays(files,inputformat,jobs,events,kwargs)
+
+        if columnar:
+            yield from arrays
+        else:
+            yield from map(list,arrays)
+
+        return
+
+    # columnar events are read and filtered an event at a time
+    # slices of events are also read this way
+    if columnar or events is not None:
+        if inputformat == 'store':
+            # stores use the filtering criteria to skip chunks of events
+            arrays = arrays_from_store(files,events=events,**kwargs)
+        else:
+            reader = eval('arrays_from_' + inputformat)
+
+            if events is None:
+                arrays = reader(files)
+            elif not files or files == '-':
+                # stdin cannot seek
+                arrays = itertools.islice(reader(files),events.start,events.stop)
+            else:
+                # read each range separately so that events never run
+                # together across ranges
+                arrays = itertools.chain.from_iterable(
+                    reader([f]) for f in
+                    _sliced_sources(files,inputformat,events))
+
+        if any(kwargs.values()):
+            arrays = (particle_filter(e,**kwargs) for e in arrays)
+
+        # skip events which are empty after filtering
+        arrays = filter(len,arrays)
+
+        if columnar:
+            yield from arrays
+        else:
+            yield from map(list,arrays)
+
+        return
 
     # set the particle generator based on the input format
     particles = eval('particles_from_' + inputformat)(files)
@@ -0,0 +1,309 @@
+"""
+Write event-by-event data.
+
+The counterpart to ebeinput:  functions here take iterables of events (lists of
+Particles or ParticleArrays) and write them to a binary file object, by default
+stdout.
+
+Text output, of events or rows of results, goes through TextWriter, which
+formats whole events or blocks of rows with a single string operation and
+collects the output in one large buffer.
+
+This module is called 'ebeoutput' for symmetry with 'ebeinput'.
+"""
+
+
+from numbers import Integral
+
+import numpy as np
+
+from .ebeinput import binary_header, binary_dtype, STORE_COLUMNS
+from .particle import ParticleArray
+
+
+def _stdout():
+    import sys
+    return sys.stdout.buffer
+
+
+def write_binary(events,file=None,floatsize=8):
+    """
+    Write events in binary particle format (see ebeinput).
+
+    Arguments
+    ---------
+    events -- iterable of events
+    file -- binary file object [optional, default stdout]
+    floatsize -- size of floating-point fields in bytes, 4 or 8
+                 [optional, default 8]
+
+    """
+
+    if file is None:
+        file = _stdout()
+
+    dtype = binary_dtype(floatsize)
+
+    file.write(binary_header(floatsize))
+
+    for e in events:
+        records = np.empty(len(e), dtype=dtype)
+
+        # columnar events are copied field by field
+        try:
+            records['ID'] = e.ID
+            records['pT'] = e.pT
+            records['phi'] = e.phi
+            records['eta'] = e.eta
+        except AttributeError:
+            records[:] = [(p.ID,p.pT,p.phi,p.eta) for p in e]
+
+        file.write(len(e).to_bytes(4,'little'))
+        file.write(records.tobytes())
+
+    file.flush()
+
+
+def write_text(events,file=None,precision=None):
+    """
+    Write events in standard text format:  one line 'ID pT phi eta' per
+    particle and an empty line after each event.
+
+    Arguments
+    ---------
+    events -- iterable of events
+    file -- binary file object [optional, default stdout]
+    precision -- significant digits of floats [optional, default shortest
+                 repr, identical to printing Particles]
+
+    """
+
+    with TextWriter(file,precision) as writer:
+        for e in events:
+            writer.write_event(e)
+
+
+class TextWriter:
+    """
+    Buffered text output.
+
+    Lines are formatted a whole event or block at a time, by repeating a
+    line template and applying it to all values at once, and collected in a
+    buffer which is written to the file when full.  Floats are formatted as
+    their shortest repr (identical to print()) or to a given number of
+    significant digits.
+
+    Usage
+    -----
+    >>> with TextWriter(precision=6) as writer:
+    ...     writer.write_event(event)
+    ...     writer.write_rows(rows)
+
+    Arguments
+    ---------
+    file -- binary file object [optional, default stdout]
+    precision -- significant digits of floats [optional, default shortest
+                 repr]
+    buffersize -- bytes to collect before writing [optional, default 4 MiB]
+
+    """
+
+    def __init__(self,file=None,precision=None,buffersize=2**22):
+        self.file = _stdout() if file is None else file
+        self.buffersize = buffersize
+        self.buffer = bytearray()
+
+        self.float = '%s' if precision is None else '%.{}g'.format(precision)
+        self.particle = '%d ' + ' '.join(3*[self.float]) + '\n'
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self,*exc):
+        self.flush()
+
+
+    def write(self,string):
+        """ Write a string. """
+
+        self.buffer += string.encode()
+
+        if len(self.buffer) >= self.buffersize:
+            self.flush()
+
+
+    def write_event(self,event):
+        """
+        Write an event in standard format, followed by an empty line.
+
+        Arguments
+        ---------
+        event -- list of particles or ParticleArray
+
+        """
+
+        n = len(event)
+        values = 4*n*[None]
+
+        # columns are interleaved into rows
+        try:
+            values[0::4] = event.ID.tolist()
+            values[1::4] = event.pT.tolist()
+            values[2::4] = event.phi.tolist()
+            values[3::4] = event.eta.tolist()
+        except AttributeError:
+            values[0::4] = [p.ID for p in event]
+            values[1::4] = [p.pT for p in event]
+            values[2::4] = [p.phi for p in event]
+            values[3::4] = [p.eta for p in event]
+
+        self.write(self.particle*n % tuple(values) + '\n')
+
+
+    def write_block(self,block):
+        """
+        Write a 2D array of floats, one line per row.
+
+        """
+
+        nrows,ncols = block.shape
+        line = ' '.join(ncols*[self.float]) + '\n'
+
+        self.write(line*nrows % tuple(block.ravel().tolist()))
+
+
+    def write_rows(self,rows):
+        """
+        Write rows of values, e.g. from aggregate rows().  Integers are written
+        as such, all other values as floats.
+
+        """
+
+        for row in rows:
+            self.write(' '.join('%d' if isinstance(v,Integral) else self.float
+                                for v in row) % tuple(row) + '\n')
+
+
+    def flush(self):
+        """ Write the buffer to the file. """
+
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer = bytearray()
+
+        self.file.flush()
+
+
+def write_store(events,path,floatsize=8,chunksize=256):
+    """
+    Write events to a columnar event store (see ebeinput).
+
+    Columns are streamed to disk as events arrive, so memory usage does not
+    depend on the number of events.  The .npy headers are written with a
+    fixed size and filled in once the final length is known.
+
+    Arguments
+    ---------
+    events -- iterable of events
+    path -- store directory, created if necessary
+    floatsize -- size of floating-point columns in bytes, 4 or 8
+                 [optional, default 8]
+    chunksize -- number of events per zone map chunk [optional, default 256]
+
+    """
+
+    import os
+
+    os.makedirs(path, exist_ok=True)
+
+    dtypes = dict(zip(STORE_COLUMNS, [np.dtype('<i4')] +
+                      3*[np.dtype('<f{}'.format(floatsize))]))
+
+    files = {c: open(os.path.join(path,c+'.npy'),'wb') for c in STORE_COLUMNS}
+
+    # reserve space for headers
+    for c,f in files.items():
+        f.write(_npy_header(dtypes[c],0))
+
+    offsets = [0]
+    zones = {k: [] for k in ('pTmin','pTmax','etamin','etamax',
+                             'absetamin','absetamax')}
+    chunk_species = []
+    species = set()
+
+    def close_chunk(pT,eta,ids):
+        abseta = np.abs(eta)
+        zones['pTmin'].append(pT.min())
+        zones['pTmax'].append(pT.max())
+        zones['etamin'].append(eta.min())
+        zones['etamax'].append(eta.max())
+        zones['absetamin'].append(abseta.min())
+        zones['absetamax'].append(abseta.max())
+        ids = set(np.unique(np.abs(ids)).tolist())
+        chunk_species.append(ids)
+        species.update(ids)
+
+    try:
+        chunk = []
+
+        for e in events:
+            # lists of particles are converted to columns
+            if not isinstance(e,ParticleArray):
+                e = ParticleArray.from_particles(e)
+
+            for c,f in files.items():
+                f.write(np.ascontiguousarray(
+                    getattr(e,c), dtype=dtypes[c]).tobytes())
+
+            offsets.append(offsets[-1] + len(e))
+            chunk.append(e)
+
+            if len(chunk) == chunksize:
+                close_chunk(*(np.concatenate([getattr(e,c) for e in chunk])
+                              for c in ('pT','eta','ID')))
+                chunk = []
+
+        if chunk:
+            close_chunk(*(np.concatenate([getattr(e,c) for e in chunk])
+                          for c in ('pT','eta','ID')))
+
+        # fill in headers
+        for c,f in files.items():
+            f.seek(0)
+            f.write(_npy_header(dtypes[c],offsets[-1]))
+
+    finally:
+        for f in files.values():
+            f.close()
+
+    np.save(os.path.join(path,'offsets.npy'), np.array(offsets, dtype=np.int64))
+
+    species = np.array(sorted(species), dtype=int)
+    bitmap = np.array([np.isin(species,list(s)) for s in chunk_species],
+                      dtype=bool).reshape(-1,species.size)
+
+    np.savez(os.path.join(path,'zones.npz'),
+             chunksize=chunksize,
+             species=species,
+             bitmap=np.packbits(bitmap, axis=1),
+             **{k: np.array(v, dtype=float) for k,v in zones.items()})
+
+
+def _npy_header(dtype,length,size=128):
+    """
+    Create a .npy (version 1.0) header for a 1D array of fixed total size, so
+    that it can be overwritten once the final length is known.
+
+    """
+
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }}".format(
+        np.lib.format.dtype_to_descr(dtype), length)
+
+    # magic string, version, header length; header padded with spaces
+    prefix = np.lib.format.MAGIC_PREFIX + bytes((1,0))
+    hlen = size - len(prefix) - 2
+
+    return prefix + hlen.to_bytes(2,'little') + \
+        header.ljust(hlen-1).encode('latin1') + b'\n'
@@ -5,8 +5,12 @@ The main implementation of the module is the Flows class.  Several functions
 exist for processing batches of events:
 
     event_by_event() -- creates a Flows for each event independently
+    event_by_event_blocks() -- same, but as arrays for blocks of many events
     average() -- creates a single Flows averaged over all events
     differential() -- creates Flows by pT bin, averaged over all events
+    cumulants() -- Q-cumulant flows v_n{2}, v_n{4} over all events
+
+All flows are calculated from Q-vectors via the qvectors() kernel.
 
 """
 
@@ -17,6 +21,46 @@ import math
 import numpy as np
 
 
+def qvectors(phi,vnmin,vnmax,chunksize=2**16):
+    """
+    Calculate flow Q-vectors Q_n = sum(exp(i*n*phi)) for a range of n.
+
+    The complex exponential is evaluated once (twice if vnmin > 1) and higher
+    harmonics are obtained by repeated complex multiplication, i.e. one pass
+    of transcendental functions regardless of the number of harmonics.  Angles
+    are processed in chunks so that temporary arrays stay small for very large
+    events.
+
+    Arguments
+    ---------
+    phi -- array of azimuthal angles
+    vnmin,vnmax -- range of n
+    chunksize -- maximum number of angles per chunk [optional, default 65536]
+
+    Returns
+    -------
+    complex array of Q_n for n = vnmin ... vnmax
+
+    """
+
+    phi = np.asarray(phi, dtype=float)
+    Q = np.zeros(vnmax - vnmin + 1, dtype=complex)
+
+    for i in range(0,phi.size,chunksize):
+        chunk = phi[i:i+chunksize]
+
+        # exp(i*phi) and exp(i*vnmin*phi)
+        z = np.exp(1j*chunk)
+        zn = z.copy() if vnmin == 1 else np.exp(1j*vnmin*chunk)
+
+        for k in range(Q.size):
+            if k:
+                zn *= z
+            Q[k] += zn.sum()
+
+    return Q
+
+
 def event_by_event(events,vnmin,vnmax,**kwargs):
     """
     Calculate flows event-by-event.
@@ -37,7 +81,95 @@ def event_by_event(events,vnmin,vnmax,**kwargs):
         yield Flows(e,vnmin,vnmax,**kwargs)
 
 
-def average(events,vnmin,vnmax):
+def event_by_event_blocks(events,vnmin,vnmax,vector=False,blocksize=2**18):
+    """
+    Calculate flows event-by-event, in blocks of many events at once.
+
+    Equivalent to event_by_event(), but events are concatenated into blocks of
+    approximately blocksize particles and the flows for all events in a block
+    are calculated with a few array operations (see block_qvectors), avoiding
+    the per-event overhead of Flows.
+
+    Arguments
+    ---------
+    events -- iterable of events
+    vnmin,vnmax -- range of v_n
+    vector -- whether to return vector components instead of magnitudes
+    blocksize -- approximate number of particles per block
+                 [optional, default 262144]
+
+    Yields
+    ------
+    float array -- for each block, with a row for each event in the same format
+                   as iter(Flows)
+
+    """
+
+    for mult,phi in _blocks(events,('phi',),blocksize):
+        offsets = np.concatenate(([0], np.cumsum(mult)))
+
+        v = block_qvectors(phi,offsets,vnmin,vnmax)
+        v /= mult[:,np.newaxis]
+
+        x,y = v.real,v.imag
+
+        if vector:
+            yield np.stack((x,y), axis=2).reshape(len(v),-1)
+        else:
+            yield np.sqrt(x*x + y*y)
+
+
+def block_qvectors(phi,offsets,vnmin,vnmax,chunksize=2**16):
+    """
+    Calculate flow Q-vectors for a block of concatenated events.
+
+    Same as qvectors() for each event, but the sums over events are segmented
+    reductions (np.add.reduceat) over the whole block.  As in qvectors(),
+    angles are processed in chunks so that temporary arrays stay small for
+    large blocks or very large events; events which span chunk boundaries are
+    summed over several chunks.
+
+    Arguments
+    ---------
+    phi -- array of azimuthal angles of all events, concatenated
+    offsets -- array of event boundaries in phi, i.e. event k is
+               phi[offsets[k]:offsets[k+1]]; length is the number of events + 1
+    vnmin,vnmax -- range of n
+    chunksize -- maximum number of angles per chunk [optional, default 65536]
+
+    Returns
+    -------
+    complex array of Q_n, shape (number of events, vnmax - vnmin + 1)
+
+    """
+
+    phi = np.asarray(phi, dtype=float)
+    offsets = np.asarray(offsets)
+
+    Q = np.zeros((offsets.size - 1, vnmax - vnmin + 1), dtype=complex)
+
+    for i in range(0,phi.size,chunksize):
+        chunk = phi[i:i+chunksize]
+
+        # segments of the chunk belonging to each (nonempty) event;
+        # reduceat does not handle empty segments, so starts must be unique
+        inner = offsets[(offsets > i) & (offsets < i + chunk.size)]
+        starts = np.unique(np.append(inner,i))
+        events = np.searchsorted(offsets,starts,side='right') - 1
+        starts -= i
+
+        z = np.exp(1j*chunk)
+        zn = z.copy() if vnmin == 1 else np.exp(1j*vnmin*chunk)
+
+        for k in range(Q.shape[1]):
+            if k:
+                zn *= z
+            Q[events,k] += np.add.reduceat(zn,starts)
+
+    return Q
+
+
+def average(events,vnmin,vnmax,**kwargs):
     """
     Calculate average flows for a set of events.
 
@@ -45,7 +177,7 @@ def average(events,vnmin,vnmax):
     ---------
     events -- iterable of events
     vnmin,vnmax -- range of v_n
-    buffer -- boolean [optional, default True]
+    kwargs -- passed to Flows
 
     Returns
     -------
@@ -53,118 +185,645 @@ def average(events,vnmin,vnmax):
 
     """
 
-    fl = Flows(None,vnmin,vnmax)
-
-    for e in events:
-        fl.add_event(e)
+    fl = Flows(None,vnmin,vnmax,**kwargs)
+    fl.add_events(events)
 
     return fl
 
 
-def differential(events,vnmin,vnmax,width=.1,bufsize=100000,floor=math.floor):
+def differential(events,vnmin,vnmax,width=.1,edges=None,variable='pT',
+                 blocksize=2**18,**kwargs):
     """
-    Calculate average differential (pT) flows for a set of events.
+    Calculate average differential (pT or eta) flows for a set of events.
 
-    Particles can be processed in chunks ("buffered") to reduce memory usage.
-    Buffering is on by default and may be disable by setting the bufsize
-    argument to any false value.  Beware:  without buffering, all particles must
-    be loaded into memory.
+    Particles are histogrammed rather than sorted into bins:  for each block
+    of events, the bin of every particle is computed at once and the
+    multiplicities and Q-vectors of all bins are accumulated with weighted
+    bincounts.  Memory usage is constant.
 
-    Buffering may have an impact on speed.  To wit, the following benchmarks,
-    with vnmin,vnmax = 2,3 and bufsize = 1000000 [the default] or None
-    [buffering off].
+    Bins are either of fixed width, starting from zero and extending as far
+    as necessary in either direction, or given by an array of edges.  With
+    edges, particles outside the outermost edges are ignored.
 
-    no. events  |  no. particles  |  buffering  |  no buffering
-    -----------------------------------------------------------
-             1  |          9,472  |    10.4 ms  |       15.0 ms
-            10  |         94,782  |    75.8 ms  |       86.8 ms
-           100  |        943,262  |     816 ms  |        819 ms
-          1000  |      9,466,762  |    8100 ms  |       8460 ms
+    Arguments
+    ---------
+    events -- iterable of events
+    vnmin,vnmax -- range of v_n
+    width -- bin width, in GeV for pT [optional, default 0.1]
+    edges -- increasing array of bin edges; overrides width [optional]
+    variable -- 'pT' or 'eta' [optional, default 'pT']
+    blocksize -- approximate number of particles per block
+                 [optional, default 262144]
+    kwargs -- passed to Flows
+
+    Returns
+    -------
+    Differential -- iterable of (x_mid, Flows) for each bin,
+                    where x_mid is the middle pT or eta value of the bin
+
+    """
+
+    diff = Differential(vnmin,vnmax,width,edges,variable,**kwargs)
+    diff.add_events(events,blocksize)
 
-    So buffering is actually faster for very large numbers of events.  Not to
-    mention, 1000 events without buffering requires ~1.5 GiB of memory.
+    return diff
 
 
+def cumulants(events,vnmin,vnmax,blocksize=2**18,**kwargs):
+    """
+    Calculate Q-cumulant flows v_n{2}, v_n{4} for a set of events.
+
     Arguments
     ---------
     events -- iterable of events
     vnmin,vnmax -- range of v_n
-    width -- width of p_T bins in GeV [optional, default 0.1]
-    bufsize -- particle buffer size [optional, default 100000]
+    blocksize -- approximate number of particles per block
+                 [optional, default 262144]
+    kwargs -- passed to Cumulants, e.g. for differential bins
+
+    Returns
+    -------
+    Cumulants
+
+    """
+
+    qc = Cumulants(vnmin,vnmax,**kwargs)
+    qc.add_events(events,blocksize)
+
+    return qc
+
+
+def _bincount(idx,weights,n):
+    """ np.bincount for complex weights. """
+
+    return np.bincount(idx,weights=weights.real,minlength=n) + \
+        1j*np.bincount(idx,weights=weights.imag,minlength=n)
+
+
+class _Bins:
+    """
+    Histogram bins for accumulating per-bin quantities.
+
+    Bins are either of fixed width, starting from zero and extended as
+    necessary in either direction, or given by an increasing array of edges.
+
+    Arguments
+    ---------
+    width -- bin width
+    edges -- array of bin edges; overrides width
+    arrays -- name=(shape,dtype) of arrays of per-bin quantities, which are
+              created with an initial axis for the bins and zero-padded as
+              bins are added; stored in the dict self.arrays
+
+    """
+
+    def __init__(self,width=.1,edges=None,**arrays):
+        if edges is not None:
+            edges = np.asarray(edges, dtype=float)
+            assert edges.ndim == 1 and edges.size > 1 and \
+                np.all(np.diff(edges) > 0)
+        else:
+            assert width > 0
+
+        self.width = width
+        self.edges = edges
+
+        # for fixed width, bin i is [(i+lo)*width, (i+lo+1)*width)
+        self.lo = 0
+        self.nbins = 0 if edges is None else edges.size - 1
+
+        self.arrays = {k: np.zeros((self.nbins,) + shape, dtype=dtype)
+                       for k,(shape,dtype) in arrays.items()}
+
+    def index(self,x):
+        """
+        Return the bin index of each value in array x; -1 if outside all bins.
+        Fixed-width bins are extended to include all values.
+
+        """
+
+        if self.edges is not None:
+            idx = np.searchsorted(self.edges,x,side='right') - 1
+            idx[idx == self.nbins] = -1
+            return idx
+
+        idx = np.floor(x/self.width).astype(int)
+
+        if idx.size:
+            self._extend(idx.min(),idx.max()+1)
+            idx -= self.lo
+
+        return idx
+
+    def _extend(self,imin,imax):
+        """ Extend fixed-width bins to include bins imin ... imax-1. """
+
+        imin = min(imin,self.lo)
+        imax = max(imax,self.lo+self.nbins)
+        pad = (self.lo - imin, imax - self.lo - self.nbins)
+
+        if any(pad):
+            for k,a in self.arrays.items():
+                self.arrays[k] = np.pad(a,(pad,)+(a.ndim-1)*((0,0),))
+            self.lo = imin
+            self.nbins = imax - imin
+
+    def merge(self,other):
+        """ Add the arrays of another set of identical bins. """
+
+        if self.edges is None:
+            assert other.edges is None and self.width == other.width
+            if other.nbins:
+                self._extend(other.lo,other.lo+other.nbins)
+        else:
+            assert other.edges is not None and \
+                np.array_equal(self.edges,other.edges)
+
+        start = other.lo - self.lo
+
+        for k,a in self.arrays.items():
+            a[start:start+other.nbins] += other.arrays[k]
+
+    def state(self):
+        """ Dict of arrays, see lib.state. """
+
+        state = dict(bins_width=self.width, bins_lo=self.lo,
+                     bins_edges=np.empty(0) if self.edges is None else self.edges)
+        state.update(('bins_'+k,a) for k,a in self.arrays.items())
+
+        return state
+
+    @classmethod
+    def from_state(cls,state):
+        edges = state['bins_edges']
+        bins = cls(state['bins_width'],edges if len(edges) else None)
+
+        bins.lo = int(state['bins_lo'])
+        bins.arrays = {k[5:]: np.array(a) for k,a in state.items()
+                       if k.startswith('bins_') and
+                       k not in ('bins_width','bins_lo','bins_edges')}
+        bins.nbins = len(next(iter(bins.arrays.values())))
+
+        return bins
+
+    def mids(self):
+        """
+        Return the middle values of the bins.  Rounded to remove annoying
+        floating-point errors.
+
+        """
+
+        if self.edges is None:
+            lo = self.lo
+            return ((2*np.arange(lo,lo+self.nbins)+1)/2*self.width).round(10)
+        else:
+            return ((self.edges[:-1] + self.edges[1:])/2).round(10)
+
+
+def _blocks(events,columns,blocksize):
+    """
+    Concatenate events into blocks of approximately blocksize particles.
+
+    Arguments
+    ---------
+    events -- iterable of events
+    columns -- names of particle attributes
+    blocksize -- approximate number of particles per block
 
     Yields
     ------
-    pT_mid, Flows -- for each pT bin,
-                     where pT_mid is the middle pT value of the bin
+    array of event multiplicities, followed by concatenated arrays of the
+    requested attributes, for each block
+
+    """
+
+    block = []
+    mult = []
+    size = 0
+
+    for e in events:
+        # columnar events already have arrays
+        try:
+            block.append([getattr(e,c) for c in columns])
+        except AttributeError:
+            block.append([np.array([getattr(p,c) for p in e]) for c in columns])
+
+        mult.append(len(e))
+        size += len(e)
+
+        if size >= blocksize:
+            yield (np.array(mult),) + tuple(np.concatenate(c) for c in zip(*block))
+            block = []
+            mult = []
+            size = 0
+
+    if block:
+        yield (np.array(mult),) + tuple(np.concatenate(c) for c in zip(*block))
+
 
+class Differential:
     """
+    Accumulates average differential flows in bins of pT or eta.  Iteration
+    yields (x_mid, Flows) for each bin.  See differential().
 
-    # flatten events
-    particles = itertools.chain.from_iterable(events)
-
-    # buffer particles
-    if bufsize:
-        flows = []
-        subevents = []
-
-        zip_longest = itertools.zip_longest
-
-        # trick to split an iterable into chunks
-        # taken from itertools recipes in the std. lib. docs
-        # once the iterable is exhausted, this will yield None
-        for buf in zip_longest(*[particles]*bufsize):
-            for p in buf:
-                try:
-                    # pT index of Particle
-                    idx = floor(p.pT/width)
-                except AttributeError:
-                    # this is None, not a Particle
-                    break
-                else:
-                    # ask forgiveness, not permission
-                    while True:
-                        try:
-                            # add particle to appropriate subevent
-                            subevents[idx].append(p)
-                        except IndexError:
-                            # create subevents as needed
-                            subevents.append([])
-                        else:
-                            break
-
-
-            # calculate flows for each subevent
-            # then clear subevents and proceed to next chunk
-            for f,s in zip_longest(flows,subevents):
-                try:
-                    f.add_event(s)
-                except AttributeError:
-                    flows.append(Flows(s,vnmin,vnmax))
-                s.clear()
-
-    # no buffering
-    else:
-        subevents = []
-
-        for p in particles:
-            # ask forgiveness, not permission
-            while True:
-                try:
-                    # add particle to appropriate subevent
-                    subevents[floor(p.pT/width)].append(p)
-                except IndexError:
-                    # create subevents as needed
-                    subevents.append([])
-                else:
-                    break
-
-        # calculate flows for each subevent
-        flows = (Flows(e,vnmin,vnmax) for e in subevents)
-
-
-    # return (pT_mid,Flows) for each bin
-    # round pT_mid to remove annoying floating-point errors
-    return ((round((2*i+1)/2*width,10), f) for i,f in enumerate(flows))
+    Arguments
+    ---------
+    vnmin,vnmax -- range of v_n
+    width,edges -- bins, as for differential()
+    variable -- 'pT' or 'eta' [optional, default 'pT']
+    vector -- passed to Flows
+
+    """
+
+    def __init__(self,vnmin,vnmax,width=.1,edges=None,variable='pT',
+                 vector=False):
+        assert vnmax >= vnmin > 0
+        assert variable in ('pT','eta')
+
+        self.vnmin = vnmin
+        self.vnmax = vnmax
+        self.variable = variable
+        self.vector = vector
+
+        # per-bin multiplicities and Q-vectors
+        self.bins = _Bins(width,edges,mult=((),int),
+                          Q=((vnmax-vnmin+1,),complex))
+
+
+    def __iter__(self):
+        bins = self.bins
+
+        for x,m,q in zip(bins.mids().tolist(),bins.arrays['mult'].tolist(),
+                         bins.arrays['Q']):
+            fl = Flows(None,self.vnmin,self.vnmax,vector=self.vector)
+            fl.add_qvectors(q,m)
+            yield x,fl
+
+
+    def add_events(self,events,blocksize=2**18):
+        """
+        Add a set of events.
+
+        Arguments
+        ---------
+        events -- iterable of events
+        blocksize -- approximate number of particles per block
+                     [optional, default 262144]
+
+        """
+
+        for _,phi,x in _blocks(events,('phi',self.variable),blocksize):
+            self.add_block(phi,x)
+
+
+    def add_block(self,phi,x):
+        """
+        Add a block of particles.
+
+        Arguments
+        ---------
+        phi -- array of azimuthal angles
+        x -- array of pT or eta
+
+        """
+
+        bins = self.bins
+
+        idx = bins.index(x)
+        if idx.size and idx.min() < 0:
+            inside = idx >= 0
+            idx,phi = idx[inside],phi[inside]
+
+        mult,Q = bins.arrays['mult'],bins.arrays['Q']
+        mult += np.bincount(idx,minlength=bins.nbins)
+
+        z = np.exp(1j*phi)
+        zn = z.copy() if self.vnmin == 1 else np.exp(1j*self.vnmin*phi)
+
+        for k in range(Q.shape[1]):
+            if k:
+                zn *= z
+            Q[:,k] += _bincount(idx,zn,bins.nbins)
+
+
+    def merge(self,other):
+        """ Add another partial result with the same bins. """
+
+        assert (self.vnmin,self.vnmax,self.variable) == \
+            (other.vnmin,other.vnmax,other.variable)
+
+        self.bins.merge(other.bins)
+
+        return self
+
+
+    def state(self):
+        """ Dict of arrays, see lib.state. """
+
+        return dict(vnmin=self.vnmin, vnmax=self.vnmax,
+                    variable=self.variable, vector=self.vector,
+                    **self.bins.state())
+
+
+    @classmethod
+    def from_state(cls,state):
+        diff = cls(state['vnmin'],state['vnmax'],variable=state['variable'],
+                   vector=state['vector'])
+        diff.bins = _Bins.from_state(state)
+
+        return diff
+
+
+    def rows(self):
+        """ Output rows:  x_mid N_particles flows, for each bin. """
+
+        for x,fl in self:
+            yield [x,fl.multiplicity,*fl]
+
+
+class Cumulants:
+    """
+    Accumulates multi-particle correlations for Q-cumulant flows v_n{2} and
+    v_n{4}, optionally also differential v_n'{2} and v_n'{4} in bins of pT or
+    eta [Bilandzic, Snellings, Voloshin, PRC 83, 044913 (2011)].
+
+    Events are added in blocks.  For each event, only the Q-vectors Q_n and
+    Q_2n and the multiplicity are needed, so each event costs a single pass
+    over its particles.  Correlations are accumulated as weighted sums, so
+    memory usage does not depend on the number of events.  Differential
+    particles of interest are the same particles as the reference particles.
+
+    Arguments
+    ---------
+    vnmin,vnmax -- range of v_n
+    width,edges -- differential bins, as for differential() [optional]
+    variable -- 'pT' or 'eta', or None for no differential flows
+                [optional, default None]
+
+    """
+
+    def __init__(self,vnmin,vnmax,width=.1,edges=None,variable=None):
+        assert vnmax >= vnmin > 0
+        assert variable in (None,'pT','eta')
+
+        self.vnmin = vnmin
+        self.vnmax = vnmax
+        self.variable = variable
+
+        nharm = vnmax - vnmin + 1
+
+        # sums of weighted correlations and weights
+        # event weights are the numbers of distinct pairs and quadruplets
+        self.events = 0
+        self.corr2 = np.zeros(nharm)
+        self.corr4 = np.zeros(nharm)
+        self.weight2 = 0
+        self.weight4 = 0
+
+        # same, per differential bin
+        if variable:
+            self.bins = _Bins(width,edges,mult=((),int),
+                              corr2=((nharm,),float),corr4=((nharm,),float),
+                              weight2=((),float),weight4=((),float))
+
+
+    def add_events(self,events,blocksize=2**18):
+        """
+        Add a set of events.
+
+        Arguments
+        ---------
+        events -- iterable of events
+        blocksize -- approximate number of particles per block
+                     [optional, default 262144]
+
+        """
+
+        columns = ('phi',) if self.variable is None else ('phi',self.variable)
+
+        for mult,*block in _blocks(events,columns,blocksize):
+            self.add_block(mult,*block)
+
+
+    def add_block(self,mult,phi,x=None):
+        """
+        Add a block of events.
+
+        Arguments
+        ---------
+        mult -- array of event multiplicities
+        phi -- azimuthal angles of all events, concatenated
+        x -- pT or eta of all events, concatenated; required for differential
+             flows
+
+        """
+
+        mult = np.asarray(mult)
+        offsets = np.concatenate(([0], np.cumsum(mult)))
+        harmonics = np.arange(self.vnmin,self.vnmax+1)
+
+        # Q_n and Q_2n of each event
+        Q = block_qvectors(phi,offsets,1,2*self.vnmax)
+        Qn = Q[:,harmonics-1]
+        Q2n = Q[:,2*harmonics-1]
+        M = mult[:,np.newaxis].astype(float)
+
+        absQn2 = Qn.real**2 + Qn.imag**2
+        absQ2n2 = Q2n.real**2 + Q2n.imag**2
+
+        # weighted 2- and 4-particle correlations
+        # events too small for pairs or quadruplets have zero weight
+        w2 = M*(M-1)
+        w4 = w2*(M-2)*(M-3)
+
+        self.events += mult.size
+        self.corr2 += (absQn2 - M).sum(axis=0, where=w2 > 0)
+        self.corr4 += (
+            absQn2**2 + absQ2n2 - 2*(Q2n*Qn.conj()**2).real -
+            4*(M-2)*absQn2 + 2*M*(M-3)
+        ).sum(axis=0, where=w4 > 0)
+        self.weight2 += w2.sum()
+        self.weight4 += w4.sum()
+
+        if self.variable:
+            self._add_differential(mult,phi,x,Qn,Q2n,M)
+
+
+    def _add_differential(self,mult,phi,x,Qn,Q2n,M):
+        bins = self.bins
+        idx = bins.index(x)
+        nbins = bins.nbins
+
+        # combined (event,bin) index of each particle
+        event = np.repeat(np.arange(mult.size),mult)
+        inside = idx >= 0
+        k = (event*nbins + idx)[inside]
+        size = mult.size*nbins
+
+        # multiplicity and p_n, p_2n in each (event,bin)
+        m = np.bincount(k,minlength=size).reshape(-1,nbins)
+
+        z = np.exp(1j*phi[inside])
+        zn = np.ones_like(z)
+
+        shape = (mult.size,nbins,Qn.shape[1])
+        pn = np.empty(shape, dtype=complex)
+        p2n = np.empty(shape, dtype=complex)
+
+        for n in range(1,2*self.vnmax+1):
+            zn *= z
+            if self.vnmin <= n <= self.vnmax:
+                pn[...,n-self.vnmin] = _bincount(k,zn,size).reshape(-1,nbins)
+            if n % 2 == 0 and self.vnmin <= n//2:
+                p2n[...,n//2-self.vnmin] = _bincount(k,zn,size).reshape(-1,nbins)
+
+        # broadcast event quantities over bins
+        Qn = Qn[:,np.newaxis]
+        Q2n = Q2n[:,np.newaxis]
+        M = M[:,np.newaxis]
+        m = m[...,np.newaxis].astype(float)
+
+        absQn2 = Qn.real**2 + Qn.imag**2
+        pQ = (pn*Qn.conj()).real
+
+        # weights:  numbers of distinct pairs and quadruplets
+        # with one particle in the bin
+        w2 = m*(M-1)
+        w4 = w2*(M-2)*(M-3)
+
+        # eqs. for <2'> and <4'> with p_n = q_n, m_p = m_q = m
+        corr2 = pQ - m
+        corr4 = (
+            absQn2*pQ - (p2n*Qn.conj()**2).real - (pn*Qn*Q2n.conj()).real -
+            2*M*pQ - 2*m*absQn2 + 7*pQ - pQ + (p2n*Q2n.conj()).real +
+            2*pQ + 2*m*M - 6*m
+        )
+
+        arrays = bins.arrays
+        arrays['mult'] += m[...,0].sum(axis=0).astype(int)
+        arrays['corr2'] += np.where(w2 > 0, corr2, 0).sum(axis=0)
+        arrays['corr4'] += np.where(w4 > 0, corr4, 0).sum(axis=0)
+        arrays['weight2'] += w2[...,0].sum(axis=0)
+        arrays['weight4'] += w4[...,0].sum(axis=0)
+
+
+    def flows(self):
+        """
+        Return reference flows v_n{2}, v_n{4} for n = vnmin ... vnmax.
+        Flows are NaN where the cumulant has the wrong sign.
+
+        Returns
+        -------
+        v2,v4 -- float arrays
+
+        """
+
+        c2,c4 = self._cumulants()
+
+        with np.errstate(invalid='ignore'):
+            return np.sqrt(c2), (-c4)**.25
+
+
+    def differential(self):
+        """
+        Return differential flows v_n'{2}, v_n'{4} for each bin.
+
+        Yields
+        ------
+        x_mid, multiplicity, v2, v4 -- for each bin, where x_mid is the middle
+                                       value of the bin and v2,v4 are float
+                                       arrays for n = vnmin ... vnmax
+
+        """
+
+        c2,c4 = self._cumulants()
+
+        arrays = self.bins.arrays
+
+        with np.errstate(invalid='ignore',divide='ignore'):
+            # <<2'>>, <<4'>>
+            corr2 = arrays['corr2'] / arrays['weight2'][:,np.newaxis]
+            corr4 = arrays['corr4'] / arrays['weight4'][:,np.newaxis]
+
+            d2 = corr2
+            d4 = corr4 - 2*corr2*c2
+
+            v2 = d2 / np.sqrt(c2)
+            v4 = -d4 / (-c4)**.75
+
+        yield from zip(self.bins.mids().tolist(),arrays['mult'].tolist(),v2,v4)
+
+
+    def merge(self,other):
+        """ Add another partial result with the same harmonics and bins. """
+
+        assert (self.vnmin,self.vnmax,self.variable) == \
+            (other.vnmin,other.vnmax,other.variable)
+
+        self.events += other.events
+        self.corr2 += other.corr2
+        self.corr4 += other.corr4
+        self.weight2 += other.weight2
+        self.weight4 += other.weight4
+
+        if self.variable:
+            self.bins.merge(other.bins)
+
+        return self
+
+
+    def state(self):
+        """ Dict of arrays, see lib.state. """
+
+        state = dict(vnmin=self.vnmin, vnmax=self.vnmax,
+                     variable=self.variable or '', events=self.events,
+                     corr2=self.corr2, corr4=self.corr4,
+                     weight2=self.weight2, weight4=self.weight4)
+
+        if self.variable:
+            state.update(self.bins.state())
+
+        return state
+
+
+    @classmethod
+    def from_state(cls,state):
+        qc = cls(state['vnmin'],state['vnmax'],variable=state['variable'] or None)
+
+        qc.events = state['events']
+        qc.corr2 = np.array(state['corr2'])
+        qc.corr4 = np.array(state['corr4'])
+        qc.weight2 = state['weight2']
+        qc.weight4 = state['weight4']
+
+        if qc.variable:
+            qc.bins = _Bins.from_state(state)
+
+        return qc
+
+
+    def rows(self):
+        """
+        Output rows:  v_min{2} ... v_max{2} v_min{4} ... v_max{4}, prefixed by
+        x_mid N_particles for each bin if differential.
+
+        """
+
+        if self.variable:
+            for x,mult,v2,v4 in self.differential():
+                yield [x,mult,*v2.tolist(),*v4.tolist()]
+        else:
+            v2,v4 = self.flows()
+            yield v2.tolist() + v4.tolist()
+
+
+    def _cumulants(self):
+        # <<2>>, <<4>> and the cumulants c_n{2}, c_n{4}
+        with np.errstate(invalid='ignore',divide='ignore'):
+            corr2 = self.corr2 / self.weight2
+            corr4 = self.corr4 / self.weight4
+
+        return corr2, corr4 - 2*corr2**2
 
 
 class Flows:
@@ -175,7 +834,7 @@ class Flows:
 
     Arguments
     ---------
-    event -- list of particles
+    event -- list of particles or ParticleArray
     vnmin,vnmax -- range of v_n
     vector -- whether iter(Flows) is vector components or magnitudes
 
@@ -204,7 +863,7 @@ class Flows:
         return self.vectorchain() if self.vector else self.magnitudes()
 
 
-    def add_event(self,event,array=np.array,cos=np.cos,sin=np.sin):
+    def add_event(self,event,array=np.array):
         """
         Add an event to the current flows.  Mainly useful for building up
         average/differential flows in pieces.
@@ -216,36 +875,101 @@ class Flows:
 
         Arguments
         ---------
-        event -- list of particles
+        event -- list of particles or ParticleArray
 
         """
 
         if event:
-            # multiplicity of new event
-            mult_event = len(event)
+            # numpy array of angles
+            # columnar events already have one
+            try:
+                phi = event.phi
+            except AttributeError:
+                phi = array([p.phi for p in event])
 
-            # total multiplicity
-            mult_total = self.multiplicity + mult_event
+            self.add_qvectors(qvectors(phi,self.vnmin,self.vnmax),len(event))
 
-            # numpy array of angles
-            phi = array([p.phi for p in event])
+
+    def add_events(self,events):
+        """
+        Add a set of events.
+
+        Arguments
+        ---------
+        events -- iterable of events
+
+        """
+
+        for e in events:
+            self.add_event(e)
+
+
+    def add_qvectors(self,Q,multiplicity):
+        """
+        Add a set of particles given by its Q-vectors to the current flows.
+
+        Arguments
+        ---------
+        Q -- array of complex Q-vectors Q_n = sum(exp(i*n*phi))
+             for n = vnmin ... vnmax
+        multiplicity -- number of particles
+
+        """
+
+        if multiplicity:
+            # total multiplicity
+            mult_total = self.multiplicity + multiplicity
 
             ### update flow vectors
             # multiplicity-weighted average of
             # the existing vector and the new event's vector
-            for k,n in enumerate(range(self.vnmin,self.vnmax+1)):
-                nphi = n*phi
-
-                self.vx[k] = (self.multiplicity*self.vx[k] +
-                        mult_event*cos(nphi).mean())/mult_total
-
-                self.vy[k] = (self.multiplicity*self.vy[k] +
-                        mult_event*sin(nphi).mean())/mult_total
+            # the sum of the new event's unit vectors is its Q-vector
+            for k,q in enumerate(np.asarray(Q).tolist()):
+                self.vx[k] = (self.multiplicity*self.vx[k] + q.real)/mult_total
+                self.vy[k] = (self.multiplicity*self.vy[k] + q.imag)/mult_total
 
             # update multiplicity
             self.multiplicity = mult_total
 
 
+    def merge(self,other):
+        """
+        Add another Flows with the same harmonics, e.g. a partial average.
+
+        """
+
+        assert (self.vnmin,self.vnmax) == (other.vnmin,other.vnmax)
+
+        m = other.multiplicity
+        self.add_qvectors([m*complex(x,y) for x,y in other.vectors()],m)
+
+        return self
+
+
+    def state(self):
+        """ Dict of arrays, see lib.state. """
+
+        return dict(vnmin=self.vnmin, vnmax=self.vnmax, vector=self.vector,
+                    multiplicity=self.multiplicity, vx=self.vx, vy=self.vy)
+
+
+    @classmethod
+    def from_state(cls,state):
+        fl = cls(None,state['vnmin'],state['vnmax'],vector=state['vector'])
+
+        fl.multiplicity = state['multiplicity']
+        fl.vx = np.asarray(state['vx']).tolist()
+        fl.vy = np.asarray(state['vy']).tolist()
+
+        return fl
+
+
+    def rows(self):
+        """ Output rows:  a single row of flows. """
+
+        yield list(self)
+
+
     def vectors(self):
         """
         Return an iterable of flow vectors:
@@ -0,0 +1,181 @@
+"""
+Maximum likelihood fit of the generalized gamma distribution with location
+fixed at zero, for flow distributions.
+
+Kept separate from stats so that SciPy is only imported when the distribution
+is actually used.
+
+The scipy parameterization is used:
+
+    f(x;a,c,scale) = c/(scale*Gamma(a)) * (x/scale)^(c*a-1) * exp(-(x/scale)^c)
+
+for x, a, c, scale > 0.
+"""
+
+
+import numpy as np
+import scipy.special as spsp
+
+from .stats import rms
+
+
+def fitstart(x,y=None):
+    """
+    Rough starting fit parameters.  Flow distributions seem to consistently
+    have rms ~ scale.
+
+    Returns
+    -------
+    a, c, loc, scale
+
+    """
+
+    return 1., 2., 0., rms(x,y)
+
+
+def fit(data):
+    """
+    Maximum likelihood fit with location fixed at zero, see mle().
+
+    Returns
+    -------
+    a, c, loc, scale -- in the order of scipy.stats.gengamma.fit
+
+    """
+
+    data = np.asarray(data, dtype=float).ravel()
+
+    a,c,_,scale = fitstart(data)
+    a,c,scale = mle(data,a,c,scale)
+
+    return a, c, 0., scale
+
+
+def mle(x,a,c,scale,tol=1e-12,maxiter=100,bins=2**14):
+    """
+    Maximum likelihood estimate of the generalized gamma parameters, with
+    location fixed at zero.
+
+    For fixed shapes the likelihood is maximized by scale^c = S(c)/(n a), where
+    S(c) = sum((x/scale)^c).  Substituting this, the log-likelihood of the
+    shapes is, up to a constant,
+
+        l(a,c) = n log(c) - n log(Gamma(a)) + (c a - 1) L - n a log(S(c)/(n a))
+                 - n a
+
+    where L = sum(log(x)).  The data thus only enter through L, computed once,
+    and S(c) and its derivatives S', S'' in c, i.e. sums of x^c, x^c log(x),
+    x^c log(x)^2, which are computed from the precomputed log(x) at each
+    iteration.  The gradient is
+
+        dl/da = c L - n digamma(a) - n log(S/(n a))
+        dl/dc = n/c + a L - n a S'/S
+
+    and the Hessian
+
+        d2l/da2 = n/a - n polygamma(1,a)
+        d2l/dadc = L - n S'/S
+        d2l/dc2 = -n/c^2 - n a (S''/S - (S'/S)^2)
+
+    l is maximized by Newton's method.  Steps are halved until the likelihood
+    increases and the shapes stay positive; where the Hessian is not negative
+    definite, a diagonally scaled gradient step is taken instead.
+
+    The data are divided by their rms before computing the sums, so that x^c
+    neither overflows nor underflows.  As in rice.mle, large data sets are first
+    reduced to the counts and means of log(x) in fine bins.
+
+    Arguments
+    ---------
+    x -- array of positive data
+    a,c,scale -- starting parameters, e.g. from fitstart(); only the shapes are
+                 actually used, since the scale is determined by them
+    tol -- relative tolerance of the parameters [optional]
+    maxiter -- maximum number of iterations [optional]
+    bins -- number of bins for large data sets [optional, default 16384]
+
+    Returns
+    -------
+    a,c,scale
+
+    """
+
+    x = np.asarray(x, dtype=float)
+    n = x.size
+
+    if not n or x.min() <= 0:
+        raise ValueError('gengamma fit requires positive data')
+
+    norm = rms(x)
+    logx = np.log(x/norm)
+    L = logx.sum()
+
+    # weighted points
+    if n > bins:
+        lo = logx.min()
+        width = (logx.max() - lo) / bins
+        if width > 0:
+            idx = np.minimum(((logx - lo) / width).astype(int), bins-1)
+            w = np.bincount(idx, minlength=bins).astype(float)
+            y = np.bincount(idx, weights=logx, minlength=bins)
+            nonzero = w > 0
+            w = w[nonzero]
+            y = y[nonzero] / w
+        else:
+            w = np.array([float(n)])
+            y = logx[:1]
+    else:
+        w = np.ones_like(logx)
+        y = logx
+
+    wy = w*y
+    wy2 = wy*y
+
+    def loglike(a,c):
+        if not (a > 0 and c > 0):
+            return -np.inf
+        S = np.dot(w, np.exp(c*y))
+        return n*np.log(c) - n*spsp.gammaln(a) + (c*a - 1)*L - \
+            n*a*np.log(S/(n*a)) - n*a
+
+    def derivatives(a,c):
+        xc = np.exp(c*y)
+        S = np.dot(w,xc)
+        dS = np.dot(wy,xc) / S
+        d2S = np.dot(wy2,xc) / S
+
+        grad = np.array([c*L - n*spsp.digamma(a) - n*np.log(S/(n*a)),
+                         n/c + a*L - n*a*dS])
+        hess = np.array([[n/a - n*spsp.polygamma(1,a), L - n*dS],
+                         [L - n*dS, -n/(c*c) - n*a*(d2S - dS*dS)]])
+
+        return grad,hess
+
+    l = loglike(a,c)
+
+    for _ in range(maxiter):
+        grad,hess = derivatives(a,c)
+
+        if hess[0,0] < 0 and np.linalg.det(hess) > 0:
+            step = -np.linalg.solve(hess,grad)
+        else:
+            step = grad / np.abs(np.diag(hess))
+
+        # halve the step until the likelihood increases and a,c stay positive
+        for _ in range(60):
+            a_new,c_new = a + step[0], c + step[1]
+            l_new = loglike(a_new,c_new)
+            if l_new >= l:
+                break
+            step = step/2
+        else:
+            break
+
+        a,c,l = a_new,c_new,l_new
+
+        if abs(step[0]) <= tol*a and abs(step[1]) <= tol*c:
+            break
+
+    scale = norm * (np.dot(w, np.exp(c*y)) / (n*a))**(1/c)
+
+    return a, c, scale
@@ -0,0 +1,100 @@
+"""
+Calculate multiplicity distributions.
+"""
+
+
+import numpy as np
+
+
+def histogram(events):
+    """
+    Calculate the multiplicity distribution of a set of events.
+
+    Arguments
+    ---------
+    events -- iterable of events
+
+    Returns
+    -------
+    Histogram
+
+    """
+
+    hist = Histogram()
+    hist.add_events(events)
+
+    return hist
+
+
+class Histogram:
+    """
+    Histogram of event multiplicities, i.e. the number of events with each
+    multiplicity.
+
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(0, dtype=int)
+
+
+    def add(self,multiplicities):
+        """
+        Add events given by their multiplicities.
+
+        Arguments
+        ---------
+        multiplicities -- iterable of integers
+
+        """
+
+        mult = np.fromiter(multiplicities, dtype=int)
+        self._add(np.bincount(mult))
+
+
+    def add_events(self,events):
+        """
+        Add a set of events.
+
+        Arguments
+        ---------
+        events -- iterable of events
+
+        """
+
+        self.add(len(e) for e in events)
+
+
+    def _add(self,counts):
+        if counts.size > self.counts.size:
+            self.counts = np.pad(self.counts,(0,counts.size-self.counts.size))
+
+        self.counts[:counts.size] += counts
+
+
+    def merge(self,other):
+        """ Add another partial histogram. """
+
+        self._add(other.counts)
+
+        return self
+
+
+    def state(self):
+        """ Dict of arrays, see lib.state. """
+
+        return dict(counts=self.counts)
+
+
+    @classmethod
+    def from_state(cls,state):
+        hist = cls()
+        hist.counts = np.array(state['counts'], dtype=int)
+
+        return hist
+
+
+    def rows(self):
+        """ Output rows:  multiplicity N_events, for each nonzero bin. """
+
+        for m in np.flatnonzero(self.counts).tolist():
+            yield [m,int(self.counts[m])]
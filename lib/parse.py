@@ -37,6 +37,50 @@ parent_parser.add_argument('-f', '--format', dest='inputformat',
     help='Input format, default:  %(default)s.')
 
 
+def event_slice(string):
+    try:
+        start,sep,stop = string.partition(':')
+        start = int(start) if start else None
+        stop = int(stop) if stop else None
+        if not sep:
+            stop = start + 1
+        if (start or 0) < 0 or (stop is not None and stop < 0):
+            raise ValueError
+    except (ValueError,TypeError):
+        raise ArgumentTypeError(string +
+            ' is not an event number or range start:stop')
+    else:
+        return slice(start,stop)
+
+# optional arg: range of events
+parent_parser.add_argument('--events', type=event_slice, metavar='start:stop',
+    help="""Read only events start to stop-1, counting from 0 across all files
+    before filtering.  Either may be omitted.  Uses file indices [ebe-index] to
+    skip directly to the first event.""")
+
+
+def positive_int(string):
+    try:
+        value = int(string)
+        if value < 1:
+            raise ValueError
+    except ValueError:
+        raise ArgumentTypeError(string + ' is not a positive integer')
+    else:
+        return value
+
+# optional arg: number of processes
+parent_parser.add_argument('-j', '--jobs', type=positive_int, default=1,
+    metavar='N',
+    help="""Read files in N parallel processes.  Output is in the same order as
+    sequential reading.  Default: %(default)s.""")
+
+# optional arg: output precision
+parent_parser.add_argument('--precision', type=positive_int, metavar='N',
+    help="""Output floats with N significant digits.  Default: shortest
+    representation which reads back exactly.""")
+
+
 # create an argument group to hold particle filtering options
 # these options will be listed separately from the rest in help
 filter_parser = parent_parser.add_argument_group('particle filtering arguments')
@@ -51,6 +95,15 @@ def intlist(string):
     else:
         return value
 
+def floatlist(string):
+    try:
+        value = [float(i) for i in string.split(',')]
+    except ValueError:
+        raise ArgumentTypeError(string +
+            ' is not a comma-separated list of numbers')
+    else:
+        return value
+
 filter_parser.add_argument('-i', '--ID', type=intlist, metavar='IDs',
     help='Particle IDs, comma-separated.')
 
@@ -95,6 +148,44 @@ filter_parser.add_argument('-m', '--mid', action=MidAction, nargs=0,
     help='Shortcut for charged particles, |eta| < 0.5.')
 
 
+def interval(string):
+    try:
+        if string.endswith('s'):
+            value = None,float(string[:-1])
+            if not value[1] > 0:
+                raise ValueError
+        else:
+            value = positive_int(string),None
+    except (ValueError,ArgumentTypeError):
+        raise ArgumentTypeError(string +
+            ' is not a number of events N or seconds Ns')
+    else:
+        return value
+
+
+def add_checkpoint_arguments(parser):
+    """
+    Add arguments for checkpointing aggregate calculations [see
+    state.accumulate] to a parser.
+
+    """
+
+    group = parser.add_argument_group('checkpoint arguments')
+
+    group.add_argument('--checkpoint', metavar='file',
+        help="""Periodically save the partial result and the input position to
+        `file' [.npz].  The file is replaced atomically, so it is always
+        complete.""")
+    group.add_argument('--interval', type=interval, default=(None,300.),
+        metavar='N|Ns',
+        help="""Checkpoint every N events or every N seconds.  Default:
+        300s.""")
+    group.add_argument('--resume', action='store_true',
+        help="""Resume from the checkpoint, if it exists, skipping directly to
+        the first unprocessed event.  The input files and filters must be the
+        same.""")
+
+
 """
 The EbEParser class.
 
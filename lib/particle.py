@@ -3,9 +3,11 @@ A Particle contains information about a physical particle.
 """
 
 
-__all__ = ['Particle', 'particle_filter']
+__all__ = ['Particle', 'ParticleArray', 'particle_filter']
 
 
+import numpy as np
+
 
 class Particle:
     """
@@ -82,6 +84,112 @@ class Particle:
 
 
 
+class ParticleArray:
+    """
+    Stores standard particle information (ID,pT,phi,eta) for an entire event as
+    contiguous NumPy arrays, i.e. a columnar event.
+
+    A list of Particles costs one Python object per particle; a ParticleArray
+    costs four arrays per event.  Calculations which only need a few columns
+    (e.g. flows only need phi) can use the arrays directly without touching
+    individual particles.
+
+    As with Particle, there is no sanity checking on the input parameters.
+    The arguments should be equal-length 1D arrays:  integer ID and float
+    pT,phi,eta.
+
+    Usage
+    -----
+    Fields are NumPy arrays addressed by name
+
+    >>> event = ParticleArray(ID,pT,phi,eta)
+    >>> event.pT
+    array([...])
+
+    The length is the number of particles
+
+    >>> len(event)
+    8571
+
+    Indexing with a slice or boolean mask returns a new ParticleArray
+
+    >>> event[event.pT > 0.5]
+    ParticleArray(...)
+
+    Iteration yields Particle objects, so a ParticleArray may be used anywhere
+    a list of Particles is expected.  Values are converted to Python types, so
+    printed Particles are identical to those from a list.
+
+    """
+
+    __slots__ = ('ID','pT','phi','eta')
+
+    def __init__(self,ID,pT,phi,eta):
+        self.ID = ID
+        self.pT = pT
+        self.phi = phi
+        self.eta = eta
+
+    @classmethod
+    def from_particles(cls,particles):
+        """
+        Create a ParticleArray from an iterable of Particle objects.
+
+        """
+
+        particles = list(particles)
+
+        return cls(
+            np.array([p.ID for p in particles], dtype=int),
+            np.array([p.pT for p in particles], dtype=float),
+            np.array([p.phi for p in particles], dtype=float),
+            np.array([p.eta for p in particles], dtype=float)
+        )
+
+    @classmethod
+    def concatenate(cls,events):
+        """
+        Join a sequence of ParticleArrays into a single ParticleArray.  Use
+        split() with the event sizes to recover the events.
+
+        """
+
+        events = list(events)
+
+        if not events:
+            return cls(np.empty(0, dtype=int), *3*[np.empty(0)])
+
+        return cls(*(np.concatenate([getattr(e,k) for e in events])
+                     for k in cls.__slots__))
+
+    def split(self,counts):
+        """
+        Split into consecutive ParticleArrays of the given sizes.  The new
+        arrays are views; no data is copied.
+
+        """
+
+        bounds = np.cumsum(counts).tolist()
+
+        return [self[i:j] for i,j in zip([0]+bounds[:-1],bounds)]
+
+    def __len__(self):
+        return self.pT.size
+
+    def __getitem__(self,key):
+        return self.__class__(
+            self.ID[key], self.pT[key], self.phi[key], self.eta[key])
+
+    def __iter__(self):
+        # tolist() converts to Python ints/floats in one step
+        return map(Particle, self.ID.tolist(), self.pT.tolist(),
+                   self.phi.tolist(), self.eta.tolist())
+
+    def __repr__(self):
+        return '{}(<{} particles>)'.format(self.__class__.__name__,len(self))
+
+
+
 
 def particle_filter(particles,**kwargs):
     """
@@ -91,9 +199,14 @@ def particle_filter(particles,**kwargs):
 
     >>> particles = particle_filter(particles, **filterargs)
 
+    A ParticleArray (columnar event) may also be passed, in which case the
+    criteria are evaluated as a single boolean mask over the whole event.
+
+    >>> event = particle_filter(event, **filterargs)
+
     Arguments
     ---------
-    particles -- iterable of Particle objects
+    particles -- iterable of Particle objects or a ParticleArray
     kwargs -- filtering criteria
 
     Allowed criteria are:
@@ -106,7 +219,7 @@ def particle_filter(particles,**kwargs):
 
     Returns
     -------
-    filtered iterable of particles
+    filtered iterable of particles, or filtered ParticleArray
     if no filtering criteria were specified, returns particles unmodified
 
     Notes
@@ -116,68 +229,149 @@ def particle_filter(particles,**kwargs):
 
     """
 
-    # init. empty list of filters
-    _filters = []
+    key = _criteria(**kwargs)
 
-    ### create a lambda function for all specified criteria
-    ### each lambda is a boolean function of Particle objects
+    # columnar events are filtered all at once
+    if isinstance(particles,ParticleArray):
+        mask = _compile(key,columnar=True)
+        return particles[mask(particles)] if mask else particles
 
-    ID = kwargs.get('ID',[])
-    charged = kwargs.get('charged',False)
+    select = _compile(key)
 
-    assert not (ID and charged)
+    # if no filters, just return the iterable as is
+    return select(particles) if select else particles
 
-    # match particle ID
-    if ID:
-        _filters.append(lambda p: p.ID in ID)
 
-    # match charged particles
-    if charged:
-        # retrieve ID list from PDG class
-        from . import pdg
-        _charged = pdg.chargedIDs()
-        _filters.append(lambda p: abs(p.ID) in _charged)
+def _criteria(ID=None,charged=False,pTmin=None,pTmax=None,
+              etamin=None,etamax=None,**kwargs):
+    """
+    Check filtering criteria and normalize them to a hashable key.  Unspecified
+    (false) criteria become None and limits become floats.  Other kwargs are
+    ignored.
 
+    """
 
-    pTmin = kwargs.get('pTmin',None)
-    pTmax = kwargs.get('pTmax',None)
+    assert not (ID and charged)
 
-    # match pT range
     if pTmin and pTmax:
         assert 0 < pTmin < pTmax
-        _filters.append(lambda p: pTmin < p.pT < pTmax)
-
-    elif pTmin and not pTmax:
+    elif pTmin:
         assert pTmin > 0
-        _filters.append(lambda p: pTmin < p.pT)
-
-    elif pTmax and not pTmin:
+    elif pTmax:
         assert pTmax > 0
-        _filters.append(lambda p: p.pT < pTmax)
 
-
-    etamin = kwargs.get('etamin',None)
-    etamax = kwargs.get('etamax',None)
-
-    # match eta range
     if etamax and etamin:
         assert etamin < etamax
-        _filters.append(lambda p: etamin < p.eta < etamax)
-
-    elif etamin and not etamax:
+    elif etamin:
         assert etamin > 0
-        _filters.append(lambda p: etamin < abs(p.eta))
-
-    elif etamax and not etamin:
+    elif etamax:
         assert etamax > 0
-        _filters.append(lambda p: abs(p.eta) < etamax)
 
+    # equal limits give equal keys regardless of type, e.g. NumPy scalars
+    limits = tuple(float(x) if x else None
+                   for x in (pTmin,pTmax,etamin,etamax))
+
+    return (tuple(sorted(set(ID))) if ID else None, bool(charged)) + limits
+
+
+# compiled filters by (criteria,columnar)
+_compiled = {}
+
+
+def _compile(key,columnar=False):
+    """
+    Compile filtering criteria into a single function.
+
+    All criteria are combined into one expression, with the numerical limits
+    as globals, which is then evaluated once to create the function.
+
+    If columnar, the function takes a ParticleArray and returns a boolean mask.
+    Species are looked up in sorted arrays, i.e. a vectorized binary search;
+    charge via the dense PDG species table.
+
+    Otherwise, the function takes an iterable of Particles and returns a
+    filtered generator.  The expression is evaluated inline in a generator
+    expression, so there are no function calls per particle.  Species are
+    looked up in frozensets.
+
+    Returns None if there are no criteria.
+
+    """
+
+    try:
+        return _compiled[key,columnar]
+    except KeyError:
+        pass
+
+    ID,charged,pTmin,pTmax,etamin,etamax = key
+
+    # particle attributes are columns or attributes of p
+    ID_, pT_, eta_ = ('e.ID','e.pT','e.eta') if columnar else \
+        ('p.ID','p.pT','p.eta')
+
+    terms = []
+    namespace = {}
+
+    # match particle ID
+    if ID:
+        if columnar:
+            namespace['IDs'] = np.array(ID)
+            terms.append('_member({},IDs)'.format(ID_))
+        else:
+            namespace['IDs'] = frozenset(ID)
+            terms.append('{} in IDs'.format(ID_))
+
+    # match charged particles
+    if charged:
+        from . import pdg
+        if columnar:
+            namespace['_charged'] = pdg.charged
+            terms.append('_charged({})'.format(ID_))
+        else:
+            namespace['_charged'] = pdg.chargedIDs()
+            terms.append('abs({}) in _charged'.format(ID_))
+
+    # match pT range and eta range
+    # a one-sided eta range is interpreted as a range of |eta|
+    for x,name,xmin,xmax,symmetric in ((pT_,'pT',pTmin,pTmax,False),
+                                       (eta_,'eta',etamin,etamax,True)):
+        if symmetric and not (xmin and xmax):
+            x = 'abs({})'.format(x)
+        if xmin:
+            namespace[name+'min'] = xmin
+            terms.append('{}min < {}'.format(name,x))
+        if xmax:
+            namespace[name+'max'] = xmax
+            terms.append('{} < {}max'.format(x,name))
+
+    if not terms:
+        f = None
+
+    elif columnar:
+        namespace.update(_member=_member)
+        f = eval('lambda e: (' + ') & ('.join(terms) + ')', namespace)
 
-    if _filters:
-        # create a filtered iterable
+    else:
         # True if all specified criteria are satisfied
         # or if the "particle" is None
-        return (p for p in particles if p is None or all(f(p) for f in _filters))
-    else:
-        # if no filters, just return the iterable as is
-        return particles
+        f = eval('lambda particles: (p for p in particles if p is None or (' +
+                 ' and '.join(terms) + '))', namespace)
+
+    _compiled[key,columnar] = f
+
+    return f
+
+
+def _member(values,table):
+    """
+    Vectorized membership test of an integer array in a sorted lookup table.
+
+    """
+
+    if not table.size:
+        return np.zeros(values.shape, dtype=bool)
+
+    idx = np.searchsorted(table,values)
+    idx[idx == table.size] = 0
+
+    return table[idx] == values
@@ -1,35 +1,36 @@
 """
 Provides an interface to PDG particle information.
+
+The PDG Monte Carlo particle table ships with the package and is read on first
+use, so importing this module costs almost nothing and no network access is
+required.  Species are assigned compact codes 0,1,2,... (their position in the
+table sorted by ID), which index dense arrays of charge and mass for fast
+vectorized lookups.
 """
 
 
 import os.path
-import sqlite3
-
-
-# database where PDG data will be stored, relative to this file's location
-dbname = 'pdg.db'
-
-# URL of PDG file containing particle info
-pdgurl = 'http://pdg.lbl.gov/2012/mcdata/mass_width_2012.mcd'
-
-#       1   contains either "M" or "W" indicating mass or width
-#  2 -  9 \ Monte Carlo particle numbers as described in the "Review of
-# 10 - 17 | Particle Physics". Charge states appear, as appropriate,
-# 18 - 25 | from left-to-right in the order -, 0, +, ++.
-# 26 - 33 /
-#      34   blank
-# 35 - 49   central value of the mass or width (double precision)
-#      50   blank
-# 51 - 58   positive error
-#      59   blank
-# 60 - 67   negative error
-#      68   blank
-# 69 - 89   particle name left-justified in the field and
-#           charge states right-justified in the field.
-#           This field is for ease of visual examination of the file and
-#           should not be taken as a standardized presentation of
-#           particle names.
+
+import numpy as np
+
+
+# PDG file containing particle info, relative to this file's location
+# from http://pdg.lbl.gov/2024/mcdata/mass_width_2024.txt
+tablename = 'mass_width_2024.mcd'
+
+# lines beginning with '*' are comments, otherwise
+#   1 -  8 \ Monte Carlo particle numbers as described in the "Review of
+#   9 - 16 | Particle Physics". Charge states appear, as appropriate,
+#  17 - 24 | from left-to-right in the order -, 0, +, ++.
+#  25 - 32 /
+#       33   blank
+#  34 - 51   central value of the mass (double precision)
+#  52 -107   errors, width
+# 108 -128   particle name left-justified in the field and
+#            charge states right-justified in the field.
+
+# charge states
+_charges = {'-': -1., '-1/3': -1/3, '0': 0., '+2/3': 2/3, '+': 1., '++': 2.}
 
 
 _pdg = None
@@ -37,105 +38,149 @@ _pdg = None
 
 ### shortcut functions to class methods
 
-def chargedIDs():
-    """ shortcut to PDG.chargedIDs() """
-
+def _table():
     global _pdg
     if not _pdg:
         _pdg = PDG()
 
-    return _pdg.chargedIDs()
+    return _pdg
+
+
+def chargedIDs():
+    """ shortcut to PDG.chargedIDs() """
+
+    return _table().chargedIDs()
+
+
+def species(IDs):
+    """ shortcut to PDG.species() """
+
+    return _table().species(IDs)
+
+
+def charge(IDs):
+    """ shortcut to PDG.charge() """
+
+    return _table().charge(IDs)
+
+
+def charged(IDs):
+    """ shortcut to PDG.charged() """
+
+    return _table().charged(IDs)
+
+
+def mass(IDs):
+    """ shortcut to PDG.mass() """
+
+    return _table().mass(IDs)
 
 
 class PDG:
     """
-    Creates and reads a sqlite DB of the PDG particle table.
+    Reads the PDG particle table.
 
     Usage
     -----
     >>> pdg = PDG()
 
-    This opens a connection to the DB.  If the DB does not exist, it is
-    created.
+    This reads the table.  Then, call a public method, e.g. to retrieve the IDs
+    of all charged particles
+    >>> pdg.chargedIDs()
+    frozenset({int, int, ...})
 
-    Then, call a public method, e.g. to retrieve the IDs of all charged
-    particles
-    >>> pdg.charged()
-    [int, int, ...]
+    or the charges of an array of particle IDs
+    >>> pdg.charge(np.array([211,-211,111]))
+    array([ 1., -1.,  0.])
+
+    Attributes
+    ----------
+    IDs -- sorted array of (positive) particle IDs; the index of an ID is its
+           species code
+    charges, masses -- arrays of charge and mass [GeV] by species code, with
+                       one extra entry (zero charge, NaN mass) for unknown
+                       species
+    names -- list of particle names by species code
 
     """
 
     def __init__(self):
-        # full path to DB is the directory of this file + DB filename
-        self._dbfile = os.path.join(os.path.dirname(__file__),dbname)
+        rows = sorted(self._getparticles())
 
-        # init. class vars.
-        self._charged = None
+        self.IDs = np.array([r[0] for r in rows], dtype=int)
+        self.charges = np.array([r[1] for r in rows] + [0.])
+        self.masses = np.array([r[2] for r in rows] + [np.nan])
+        self.names = [r[3] for r in rows]
 
-        # need to create the DB if it doesn't exist
-        shouldmakedb = not os.path.exists(self._dbfile)
+        self._charged = frozenset(
+            int(i) for i in self.IDs[self.charges[:-1] != 0])
 
-        # open a connection to the DB
-        self._conn = sqlite3.connect(self._dbfile)
 
-        if shouldmakedb:
-            self._makedb()
+    def _getparticles(self):
+        # read the PDG particle table and generate tuples
+        # (ID,charge,mass,name) for each particle
+        filename = os.path.join(os.path.dirname(__file__),tablename)
 
+        with open(filename) as f:
+            for l in f:
+                # skip comments
+                if l.startswith('*'):
+                    continue
 
-    def __del__(self):
-        # commit any remaining changes and close the connection
-        self._conn.commit()
-        self._conn.close()
+                # extract ID(s)
+                ID = [int(l[i:i+8]) for i in range(0,32,8) if l[i:i+8].strip()]
 
+                # mass; missing for e.g. neutrinos
+                mass = float(l[33:51]) if l[33:51].strip() else float('nan')
 
-    def _makedb(self):
-        # create a SQL table to hold particle info
-        self._conn.execute('create table particles \
-            (id INT,mass DOUBLE,name VARCHAR(30),charge VARCHAR(5))')
+                # name and charge(s)
+                *name,charge = l[107:].split()
+                charge = charge.split(',')
 
-        # create a row for each particle via the _getparticles generator
-        self._conn.executemany('insert into particles \
-            (id,mass,name,charge) values (?,?,?,?)', self._getparticles())
+                # treat each ID/charge as a separate particle
+                for k in range(len(ID)):
+                    yield ID[k],_charges[charge[k]],mass,' '.join(name)
 
-        # commit changes
-        self._conn.commit()
 
+    def species(self,IDs):
+        """
+        Convert particle IDs to species codes.  Antiparticles have the same code
+        as their particles.  Unknown IDs are mapped to len(self.IDs).
 
-    def _getparticles(self):
-        # download the PDG particle table and generate tuples
-        # (ID,mass,name,charge) for each particle
-        from urllib.request import urlopen
-        with urlopen(pdgurl) as f:
-            for l in f:
-                # mass lines only
-                if l[0:1] == b'M':
+        Arguments
+        ---------
+        IDs -- integer or array of integers
+
+        Returns
+        -------
+        integer array of species codes
+
+        """
+
+        IDs = np.abs(IDs)
+
+        n = self.IDs.size
+        codes = np.searchsorted(self.IDs,IDs)
+
+        return np.where(self.IDs[np.minimum(codes,n-1)] == IDs, codes, n)
 
-                    # extract ID(s)
-                    ID = []
-                    for i in [2,10,18,26]:
-                        j = l[i:i+7]
-                        if j.strip():
-                            ID.append(int(j))
 
-                    # mass
-                    mass = float(l[35:49])
+    def charge(self,IDs):
+        """ Charges of particle IDs (antiparticles have opposite charge). """
 
-                    # name and charge(s)
-                    name,charge = l[68:89].decode().split()
-                    charge = charge.split(',')
+        return np.sign(IDs) * self.charges[self.species(IDs)]
 
-                    ### unnecessary...
-                    ## convert charge(s) to numbers
-                    #charge = [{'-': -1,
-                    #    '-1/3': float(-1/3),
-                    #    '0': 0,
-                    #    '+2/3': float(2/3),
-                    #    '+': 1,
-                    #    '++': 2}[x] for x in charge.split(',')]
 
-                    # treat each ID/charge as a separate particle
-                    for k in range(len(ID)):
-                        yield ID[k],mass,name,charge[k]
+    def charged(self,IDs):
+        """ Boolean array, whether each particle ID is charged. """
+
+        return self.charges[self.species(IDs)] != 0
+
+
+    def mass(self,IDs):
+        """ Masses of particle IDs [GeV]. """
+
+        return self.masses[self.species(IDs)]
 
 
     def chargedIDs(self):
@@ -144,11 +189,8 @@ class PDG:
 
         Returns
         -------
-        list of integers
+        frozenset of integers
 
         """
 
-        if not self._charged:
-            self._charged = [row[0] for row in self._conn.execute('select id from particles where charge != 0')]
-
         return self._charged
@@ -0,0 +1,219 @@
+"""
+The Rice / Bessel-Gaussian distribution for flow distributions.
+
+Kept separate from stats so that SciPy is only imported when the distribution
+is actually used.
+
+Bessel functions are evaluated via the exponentially scaled i0e, i1e, i.e.
+log(I0(z)) = log(i0e(z)) + z, which never overflow.
+"""
+
+
+import functools
+
+import numpy as np
+import scipy.special as spsp
+import scipy.stats as spst
+
+
+class rice_gen(spst.rv_continuous):
+    """
+    The Rice / Bessel-Gaussian distribution with standard parameterization.
+    Replaces scipy.stats.rice in stats.validate_dist.
+
+    Parameters are named for flow distributions:
+
+        vrp -- v_n reaction-plane
+        dv -- delta v_n
+
+    The PDF is
+
+        f(v;vrp,dv) = v/dv^2 * exp(-(v^2+vrp^2)/(2*dv^2)) * I[0](v*vrp/dv^2)
+
+    for v, vrp, dv > 0.
+
+    The scipy location and scale parameters should be left fixed at defaults.
+    The fit method is set to do this automatically and only returns vrp,dv.
+    This is a bit of a hack but should be transparent to the user.
+
+    """
+
+    def _pdf(self, v, vrp, dv, exp=np.exp, i0e=spsp.i0e):
+        # I0(z) * exp(-(v^2+vrp^2)/(2*dv^2)) = i0e(z) * exp(-(v-vrp)^2/(2*dv^2))
+        dv2 = dv*dv
+        return v / dv2 * exp(-0.5*(v-vrp)*(v-vrp)/dv2) * i0e(v*vrp/dv2)
+
+    def _logpdf(self, v, vrp, dv, log=np.log, i0e=spsp.i0e):
+        dv2 = dv*dv
+        return log(v/dv2) - 0.5*(v-vrp)*(v-vrp)/dv2 + log(i0e(v*vrp/dv2))
+
+    def _cdf(self, v, vrp, dv, chndtr=spsp.chndtr):
+        # (v/dv)^2 is noncentral chi-square with 2 degrees of freedom and
+        # noncentrality (vrp/dv)^2, i.e. 1 - Marcum Q1(vrp/dv, v/dv)
+        return chndtr((v/dv)**2, 2, (vrp/dv)**2)
+
+    def _argcheck(self,*args):
+        vrp,dv = args
+        return (vrp >= 0) & (dv > 0)
+
+    def _fitstart(self,data):
+        """ Rough starting fit parameters, based on ATLAS results. """
+
+        mean = data.mean()
+        std = data.std()
+        return np.sqrt(max(mean**2-std**2,0)), std, 0, 1
+
+    def fit(self, data, *args, **kwargs):
+        """ Maximum likelihood fit with fixed location and scale, see mle(). """
+
+        data = np.asarray(data, dtype=float)
+
+        return mle(data,*self._fitstart(data)[:2])
+
+rice = rice_gen(a=0.0, name="rice", shapes="vrp,dv")
+
+
+@functools.lru_cache(maxsize=16)
+def _cdf_table(vrp,dv,points):
+    # the CDF is within 1e-30 of 0 or 1 more than 12 dv from vrp
+    x = np.linspace(max(vrp - 12*dv, 0), vrp + 12*dv, points)
+    return x, rice.cdf(x,vrp,dv)
+
+
+def interpolated_cdf(v,vrp,dv,points=2**14):
+    """
+    The Rice CDF by linear interpolation on a grid of points, which is cached
+    for repeated evaluation with the same parameters, e.g. KS tests of many
+    data sets against the same distribution.  With the default grid, the error
+    is below 1e-7, far below the resolution of a KS test.
+
+    Arguments
+    ---------
+    v -- array of values
+    vrp,dv -- distribution parameters
+    points -- size of the grid [optional, default 16384]
+
+    Returns
+    -------
+    array of CDF values
+
+    """
+
+    x,F = _cdf_table(float(vrp),float(dv),points)
+
+    return np.interp(v,x,F)
+
+
+def mle(v,vrp,dv,tol=1e-12,maxiter=100,bins=2**14):
+    """
+    Maximum likelihood estimate of the Rice parameters.
+
+    The log-likelihood, up to a constant, in terms of a = vrp, u = 1/dv^2 is
+
+        l(a,u) = n log(u) - u/2 (sum(v^2) + n a^2) + sum(log(I0(a u v)))
+
+    It is maximized by Newton's method with the analytic gradient and Hessian,
+    using the ratio R = I1/I0 = i1e/i0e and its derivative R' = 1 - R/z - R^2.
+    Steps are halved until the likelihood increases; where the Hessian is not
+    negative definite, a diagonally scaled gradient step is taken instead.
+    l is even in a, so a is unconstrained and vrp = |a|.
+
+    At a = 0 and the Rayleigh value u = 2n/sum(v^2), the gradient and the
+    second derivative in a vanish, and the profile likelihood is quartic in a
+    with a coefficient proportional to 2 mean(v^2)^2 - mean(v^4).  If that is
+    not positive, a = 0 is the maximum and is returned directly, since Newton's
+    method would only converge to it linearly.
+
+    Large data sets are first reduced to the counts and means of the data in
+    fine bins, so that the Bessel functions are only evaluated once per bin.
+    The sum of squares is exact; the remaining sums change by a relative amount
+    of order (bin width / dv)^2, which is far below statistical precision.
+
+    Arguments
+    ---------
+    v -- array of data
+    vrp,dv -- starting parameters, e.g. from rice._fitstart
+    tol -- relative tolerance of the parameters [optional]
+    maxiter -- maximum number of iterations [optional]
+    bins -- number of bins for large data sets [optional, default 16384]
+
+    Returns
+    -------
+    vrp,dv
+
+    """
+
+    v = np.asarray(v, dtype=float)
+    n = v.size
+    v2 = v*v
+    sv2 = v2.sum()
+
+    if n*np.dot(v2,v2) >= 2*sv2*sv2:
+        return 0., np.sqrt(sv2/(2*n))
+
+    # weighted points
+    if n > bins:
+        idx = np.minimum((v * (bins/v.max())).astype(int), bins-1)
+        w = np.bincount(idx, minlength=bins).astype(float)
+        x = np.bincount(idx, weights=v, minlength=bins)
+        nonzero = w > 0
+        w = w[nonzero]
+        x = x[nonzero] / w
+    else:
+        x = v
+        w = np.ones_like(v)
+
+    wx = w*x
+    wx2 = wx*x
+
+    def loglike(a,u):
+        z = np.abs(a*u)*x
+        return n*np.log(u) - 0.5*u*(sv2 + n*a*a) + \
+            np.dot(w, np.log(spsp.i0e(z)) + z)
+
+    def derivatives(a,u):
+        z = a*u*x
+        R = spsp.i1e(z)/spsp.i0e(z)
+        # R/z -> 1/2 as z -> 0
+        Rz = np.divide(R, z, out=np.full_like(z,.5), where=(z != 0))
+        dR = 1 - Rz - R*R
+
+        vR = np.dot(wx,R)
+        v2dR = np.dot(wx2,dR)
+
+        grad = np.array([u*vR - n*a*u, n/u - 0.5*(sv2 + n*a*a) + a*vR])
+        hess = np.array([[u*u*v2dR - n*u, vR + a*u*v2dR - n*a],
+                         [vR + a*u*v2dR - n*a, a*a*v2dR - n/(u*u)]])
+
+        return grad,hess
+
+    # start slightly off zero, since a = 0 is always a stationary point
+    a = max(vrp,1e-3*dv)
+    u = 1/(dv*dv)
+    l = loglike(a,u)
+
+    for _ in range(maxiter):
+        grad,hess = derivatives(a,u)
+
+        if hess[0,0] < 0 and np.linalg.det(hess) > 0:
+            step = -np.linalg.solve(hess,grad)
+        else:
+            step = grad / np.abs(np.diag(hess))
+
+        # halve the step until the likelihood increases and u stays positive
+        for _ in range(60):
+            a_new,u_new = a + step[0], u + step[1]
+            if u_new > 0:
+                l_new = loglike(a_new,u_new)
+                if l_new >= l:
+                    break
+            step = step/2
+        else:
+            break
+
+        a,u,l = a_new,u_new,l_new
+
+        if abs(step[0]) <= tol*(abs(a) + u**-.5) and abs(step[1]) <= tol*u:
+            break
+
+    return abs(a), u**-.5
@@ -0,0 +1,346 @@
+"""
+Run ebe-* command lines in a persistent daemon, to avoid the startup cost of
+the interpreter and of importing NumPy/SciPy for every invocation.
+
+The daemon (ebe-serve) imports the lib modules once and listens on a Unix
+socket.  A client sends its command line, working directory, and environment,
+together with its stdin, stdout, and stderr file descriptors.  The daemon runs
+the executable in a forked copy of itself, with the client's descriptors in
+place of its own, so input and output go directly to the client's files or
+pipes.  The exit status is sent back and the client exits with it.
+
+Requests are served by a pool of worker processes which accept connections
+from the shared socket, so several requests run at once.  Each request runs in
+a fresh fork of a worker, so requests cannot affect each other.
+
+The ebe-* executables call route() before any heavy imports:  if the
+environment variable EBE_SERVE is set to the socket path of a running daemon,
+the command line is run there, otherwise (or if the daemon is not running) it
+runs as usual.
+
+This module must be cheap to import, since every executable imports it; the
+client only imports the socket and json modules if EBE_SERVE is set.
+"""
+
+
+import os
+import sys
+
+
+# environment variable holding the socket path
+ENVIRON = 'EBE_SERVE'
+
+# directory containing the executables
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules to import in the daemon
+PRELOAD = ['numpy', 'lib.ebeinput', 'lib.ebeoutput', 'lib.flows',
+           'lib.multiplicity', 'lib.parse', 'lib.particle', 'lib.pdg',
+           'lib.state', 'lib.stats', 'lib.workqueue',
+           'scipy.optimize', 'scipy.special', 'scipy.stats', 'lib.rice',
+           'lib.gengamma']
+
+# requests are prefixed by their size
+_HEADER = 4
+
+
+def route():
+    """
+    Run the current command line in the daemon, if EBE_SERVE is set and the
+    daemon is running, and exit with its status.  Otherwise, return and let
+    the caller run as usual.
+
+    """
+
+    path = os.environ.get(ENVIRON)
+
+    if not path:
+        return
+
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return
+
+    try:
+        status = request(sock,sys.argv)
+    except KeyboardInterrupt:
+        # closing the connection stops the request
+        status = 130
+
+    sys.exit(status)
+
+
+def request(sock,argv):
+    """
+    Send a command line over a connected socket and wait for the exit status.
+
+    Arguments
+    ---------
+    sock -- socket connected to the daemon
+    argv -- command line, argv[0] is the executable
+
+    Returns
+    -------
+    exit status
+
+    """
+
+    import json
+    import socket
+
+    data = json.dumps(dict(argv=argv, cwd=os.getcwd(),
+                           env=dict(os.environ))).encode()
+
+    # the descriptors are sent along with the first bytes
+    socket.send_fds(sock, [len(data).to_bytes(_HEADER,'little') + data],
+                    [0,1,2])
+
+    status = _recv_exactly(sock,_HEADER)
+    sock.close()
+
+    if not status:
+        # the daemon died
+        return 1
+
+    return int.from_bytes(status,'little',signed=True)
+
+
+def _recv_exactly(sock,n):
+    # receive exactly n bytes, or b'' if the connection closes first
+    data = b''
+
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            return b''
+        data += chunk
+
+    return data
+
+
+def serve(path,workers=4):
+    """
+    Run the daemon until terminated.
+
+    Arguments
+    ---------
+    path -- socket path; an existing socket is replaced
+    workers -- number of requests to run at once [optional, default 4]
+
+    """
+
+    import importlib
+    import signal
+    import socket
+
+    for name in PRELOAD:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+    # read the particle table now rather than in every request
+    from . import pdg
+    pdg._table()
+
+    if os.path.exists(path):
+        os.unlink(path)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    # only the owner may connect
+    umask = os.umask(0o077)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(umask)
+
+    sock.listen(64)
+
+    pids = set()
+    stopping = False
+
+    def stop(signum,frame):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            try:
+                os.kill(pid,signal.SIGTERM)
+            except ProcessLookupError:
+                # already reaped, but not yet removed from pids
+                pass
+
+    signal.signal(signal.SIGTERM,stop)
+    signal.signal(signal.SIGINT,stop)
+
+    try:
+        while True:
+            # start workers, and replace any which die
+            while len(pids) < workers and not stopping:
+                pid = os.fork()
+                if not pid:
+                    signal.signal(signal.SIGTERM,signal.SIG_DFL)
+                    signal.signal(signal.SIGINT,signal.SIG_IGN)
+                    os._exit(_worker(sock))
+                pids.add(pid)
+
+            if not pids:
+                break
+
+            try:
+                pid,_ = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            pids.discard(pid)
+
+    finally:
+        sock.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def _worker(sock):
+    """
+    Accept and run requests forever.
+
+    """
+
+    while True:
+        conn,_ = sock.accept()
+
+        try:
+            _handle(conn)
+        except Exception:
+            # the client went away, or sent garbage
+            pass
+        finally:
+            conn.close()
+
+
+def _handle(conn):
+    """
+    Receive a request, run it in a child process, and send the exit status.
+
+    """
+
+    import json
+    import select
+    import signal
+    import socket
+
+    data,fds,_,_ = socket.recv_fds(conn,2**16,3)
+
+    try:
+        size = int.from_bytes(data[:_HEADER],'little')
+        data = data[_HEADER:]
+        data += _recv_exactly(conn,size-len(data))
+        req = json.loads(data.decode())
+
+        pid = os.fork()
+
+        if not pid:
+            conn.close()
+            _run(req,fds)
+
+    finally:
+        for fd in fds:
+            os.close(fd)
+
+    # wait for the child to exit, or stop it if the client goes away, e.g. on
+    # ctrl-c; the child is not reaped until afterwards, so its pid is valid
+    pidfd = os.pidfd_open(pid)
+
+    try:
+        ready,_,_ = select.select([conn,pidfd],[],[])
+        if pidfd not in ready and not conn.recv(1):
+            os.kill(pid,signal.SIGTERM)
+    finally:
+        os.close(pidfd)
+
+    _,status = os.waitpid(pid,0)
+    status = os.waitstatus_to_exitcode(status)
+
+    # negative codes are signals; report them as the shell does
+    if status < 0:
+        status = 128 - status
+
+    conn.sendall(status.to_bytes(_HEADER,'little',signed=True))
+
+
+def _run(req,fds):
+    """
+    Run a command line in this (forked) process with the client's
+    descriptors, working directory, and environment, then exit.
+
+    """
+
+    import runpy
+    import signal
+
+    signal.signal(signal.SIGTERM,signal.SIG_DFL)
+    signal.signal(signal.SIGINT,signal.SIG_DFL)
+
+    status = 1
+
+    try:
+        for fd,target in zip(fds,(0,1,2)):
+            os.dup2(fd,target)
+            os.close(fd)
+
+        sys.stdin = open(0, closefd=False)
+        sys.stdout = open(1, 'w', closefd=False,
+                          buffering=(1 if os.isatty(1) else -1))
+        sys.stderr = open(2, 'w', closefd=False, buffering=1,
+                          errors='backslashreplace')
+
+        argv = req['argv']
+        script = os.path.join(ROOT,os.path.basename(argv[0]))
+
+        os.chdir(req['cwd'])
+        os.environ.clear()
+        os.environ.update(req['env'])
+
+        # never route recursively
+        os.environ.pop(ENVIRON,None)
+
+        if not os.path.basename(script).startswith('ebe-') or \
+                script.endswith('ebe-serve') or not os.path.isfile(script):
+            print('ebe-serve: not an executable:', argv[0], file=sys.stderr)
+            status = 127
+        else:
+            sys.argv = argv
+
+            try:
+                runpy.run_path(script,run_name='__main__')
+                status = 0
+            except SystemExit as e:
+                if e.code is None:
+                    status = 0
+                elif isinstance(e.code,int):
+                    status = e.code
+                else:
+                    print(e.code, file=sys.stderr)
+                    status = 1
+
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+        status = 1
+
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+
+        os._exit(status)
@@ -0,0 +1,260 @@
+"""
+Save, load, and merge partial results of aggregate calculations.
+
+Aggregates, e.g. average flows, are normally calculated over all events in a
+single process.  Instead, events may be split into any number of parts, the
+aggregate calculated for each part and saved, and the partial results merged
+into the final result, e.g. to distribute work across batch jobs.
+
+An aggregate class provides the methods
+
+    state() -- returns a dict of arrays and scalars
+    from_state() -- classmethod, creates an instance from such a dict
+    merge(other) -- adds another partial result in place and returns self;
+                    merging is associative, so partial results may be merged
+                    in any grouping
+    rows() -- yields the rows of output, as lists of values
+    add_events(events) -- adds an iterable of events
+
+The aggregates are:
+
+    flows.Flows -- average flows
+    flows.Differential -- differential flows
+    flows.Cumulants -- Q-cumulant flows
+    multiplicity.Histogram -- multiplicity distribution
+
+Partial results are saved as .npz files.
+
+Long calculations may be checkpointed via accumulate():  the partial result and
+the input position are saved periodically, and a restarted calculation resumes
+from the checkpoint.
+"""
+
+
+from functools import reduce
+import itertools
+import os
+import time
+
+import numpy as np
+
+
+def _kinds():
+    """ Aggregate classes by name. """
+
+    from .flows import Flows, Differential, Cumulants
+    from .multiplicity import Histogram
+
+    return {cls.__name__: cls for cls in (Flows,Differential,Cumulants,Histogram)}
+
+
+def save(obj,filename,**info):
+    """
+    Save the state of an aggregate to a .npz file.  The file is written
+    atomically, i.e. it is either complete or does not exist.
+
+    Arguments
+    ---------
+    obj -- aggregate
+    filename -- output filename; '.npz' is NOT appended
+    info -- additional arrays or scalars to save, e.g. for checkpoints
+
+    """
+
+    kind = obj.__class__.__name__
+    assert kind in _kinds()
+
+    import tempfile
+
+    # temporary file in the same directory, so that it can be renamed
+    fd,tmp = tempfile.mkstemp(dir=os.path.dirname(filename) or '.',
+                              suffix='.tmp')
+
+    with os.fdopen(fd,'wb') as f:
+        np.savez(f, kind=kind, **obj.state(),
+                 **{'info_'+k: v for k,v in info.items()})
+
+    os.replace(tmp,filename)
+
+
+def load(filename,info=False):
+    """
+    Load an aggregate from a .npz file.
+
+    Arguments
+    ---------
+    filename -- file written by save()
+    info -- boolean, also return the additional info [optional]
+
+    Returns
+    -------
+    aggregate, or (aggregate, dict of info) if info
+
+    """
+
+    with np.load(filename) as f:
+        # convert 0d arrays to python scalars
+        state = {k: v.item() if v.ndim == 0 else v for k,v in f.items()}
+
+    extra = {k[5:]: state.pop(k) for k in list(state) if k.startswith('info_')}
+    obj = _kinds()[state.pop('kind')].from_state(state)
+
+    return (obj,extra) if info else obj
+
+
+def merge(objs):
+    """
+    Merge aggregates of the same kind.
+
+    Arguments
+    ---------
+    objs -- iterable of aggregates, which may be modified
+
+    Returns
+    -------
+    merged aggregate
+
+    """
+
+    return reduce(_merge,objs)
+
+
+def _merge(a,b):
+    if type(a) is not type(b):
+        raise TypeError('cannot merge {} and {}'.format(
+            type(a).__name__,type(b).__name__))
+
+    return a.merge(b)
+
+
+class CheckpointError(ValueError):
+    """ A checkpoint cannot be resumed by the current calculation. """
+
+
+def accumulate(obj,files=None,inputformat='auto',events=None,jobs=1,
+               checkpoint=None,interval=(None,300.),resume=False,**kwargs):
+    """
+    Add events from files to an aggregate, periodically saving a checkpoint.
+
+    A checkpoint is the partial result plus the input position, i.e. the
+    number of events read so far, counting from zero across all files before
+    filtering (as in events_from_files).  Events are therefore read unfiltered
+    and filtered here.  On resume, reading skips directly to the next event via
+    the file indices, and the events already processed are not parsed again.
+
+    Checkpoints are only written between blocks of events, and only the small
+    aggregate state is saved, so the cost is negligible.
+
+    Arguments
+    ---------
+    obj -- aggregate, normally empty
+    files,inputformat,events,jobs -- passed to events_from_files
+    checkpoint -- checkpoint filename [optional, default no checkpoints]
+    interval -- (N,seconds):  checkpoint every N events or after the given
+                number of seconds; one should be None
+                [optional, default every 300 s]
+    resume -- boolean, restore the aggregate and input position from the
+              checkpoint if it exists [optional]
+    kwargs -- for particle_filter
+
+    Returns
+    -------
+    aggregate
+
+    Raises
+    ------
+    CheckpointError -- if the checkpoint is for different input or a
+                       different calculation; errors in the calculation
+                       itself are not caught
+
+    """
+
+    from .ebeinput import events_from_files
+    from .particle import particle_filter, _criteria
+
+    if isinstance(files,str):
+        files = [files]
+
+    # the same files may be given by different paths, e.g. from another cwd
+    if files and files != '-' and '-' not in files:
+        files = [os.path.realpath(f) for f in files]
+
+    stop = events and events.stop
+    start = events and events.start or 0
+
+    # input which the position refers to
+    criteria = _criteria(**kwargs)
+    source = repr((files,inputformat,criteria,stop))
+
+    if resume and checkpoint and os.path.exists(checkpoint):
+        saved,info = load(checkpoint,info=True)
+        if info.get('source') != source:
+            raise CheckpointError(checkpoint + ' is for different input')
+
+        # merging also checks the settings of the calculation
+        try:
+            obj = _merge(obj,saved)
+        except (TypeError,AssertionError):
+            raise CheckpointError(checkpoint + ' is for different settings')
+
+        start = info['events']
+
+    raw = events_from_files(files,inputformat,columnar=True,jobs=jobs,
+                            events=(slice(start,stop) if start or stop
+                                    else None))
+
+    every,seconds = interval
+    last = start,time.monotonic()
+    position = start
+
+    for n,batch in _batches(raw,every,
+                            particle_filter if any(criteria) else None,
+                            kwargs):
+        obj.add_events(batch)
+        position += n
+
+        if checkpoint and (
+                (every and position - last[0] >= every) or
+                (seconds and time.monotonic() - last[1] >= seconds)):
+            save(obj,checkpoint,events=position,source=source)
+            last = position,time.monotonic()
+
+    if checkpoint:
+        save(obj,checkpoint,events=position,source=source)
+
+    return obj
+
+
+def _batches(events,every,particle_filter,kwargs,size=2**18):
+    """
+    Group events into batches of approximately `size' particles, or `every'
+    events, whichever is smaller, filtering each event.
+
+    Yields
+    ------
+    (number of events before filtering, list of nonempty filtered events)
+
+    """
+
+    events = iter(events)
+
+    while True:
+        batch = []
+        n = particles = 0
+
+        for e in itertools.islice(events,every):
+            n += 1
+            if particle_filter:
+                e = particle_filter(e,**kwargs)
+                if not len(e):
+                    continue
+
+            batch.append(e)
+            particles += len(e)
+            if particles >= size:
+                break
+
+        if not n:
+            return
+
+        yield n,batch
@@ -1,32 +1,46 @@
 """
 Statistics.
+
+SciPy and Matplotlib are slow to import, so they are imported on first use:
+SciPy when a distribution is needed, Matplotlib only for plotting.
 """
 
 
 from functools import partial
-import math
 
 import numpy as np
-import matplotlib.pyplot as plt
-import scipy.special as spsp
-import scipy.stats as spst
-import scipy.optimize as spop
-
 
 
 """
 Plot style settings.
 
+Applied when pyplot is first needed, see _pyplot().
+
 """
 
 _figwidth = 10
+_colors = ['#33b5e5','#99cc00','#ff4444','#aa66cc','#ffbb33']
+
+_plt = None
+
+
+def _pyplot():
+    """ Import pyplot and apply the plot style on first use. """
+
+    global _plt
 
-plt.rc('figure', figsize=[_figwidth,_figwidth/1.618], facecolor='1.0')
-plt.rc('font', family='serif')
-plt.rc('axes', color_cycle=['#33b5e5','#99cc00','#ff4444','#aa66cc','#ffbb33'])
-plt.rc('lines', linewidth=1.5)
-plt.rc('patch', linewidth=1.5)
+    if _plt is None:
+        import matplotlib.pyplot as plt
 
+        plt.rc('figure', figsize=[_figwidth,_figwidth/1.618], facecolor='1.0')
+        plt.rc('font', family='serif')
+        plt.rc('axes', prop_cycle=plt.cycler(color=_colors))
+        plt.rc('lines', linewidth=1.5)
+        plt.rc('patch', linewidth=1.5)
+
+        _plt = plt
+
+    return _plt
 
 
 def rms(x,y=None):
@@ -58,78 +72,24 @@ def rms(x,y=None):
 
 
 def validate_dist(dist):
-    """ Convert a string to a scipy.stats distribution object. """
-
-    try:
-        dist = getattr(spst,dist)
-    except AttributeError:
-        raise ValueError('invalid distribution: ' + dist)
-
-    return dist
-
-
-"""
-Starting parameters for fitting the generalized gamma distribution.
-
-Flow distributions seem to consistently have rms ~ scale.
-
-order:  a, c, loc, scale -- where a,c are shape params.
-
-"""
-
-spst.gengamma._fitstart = lambda *args: (1., 2., 0., rms(*args))
-
-# fix loc = 0 when fitting gengamma
-spst.gengamma.fit = partial(spst.gengamma.fit, floc=0)
-
-
-class rice_gen(spst.rv_continuous):
     """
-    The Rice / Bessel-Gaussian distribution with standard parameterization.
-    Overrides scipy.stats.rice.
-
-    Parameters are named for flow distributions:
-
-        vrp -- v_n reaction-plane
-        dv -- delta v_n
-
-    The PDF is
-
-        f(v;vrp,dv) = v/dv^2 * exp(-(v^2+vrp^2)/(2*dv^2)) * I[0](v*vrp/dv^2)
-
-    for v, vrp, dv > 0.
-
-    The scipy location and scale parameters should be left fixed at defaults.
-    The fit method is set to do this automatically and only returns vrp,dv.
-    This is a bit of a hack but should be transparent to the user.
+    Convert a string to a scipy.stats distribution object.  'rice' is the
+    flow-parameterized Rice distribution from the rice module.
 
     """
 
-    def _pdf(self, v, vrp, dv, exp=np.exp, i0=spsp.i0):
-        dv2 = dv*dv
-        return v / dv2 * exp(-0.5*(v*v+vrp*vrp)/dv2) * i0(v*vrp/dv2)
-
-    def _logpdf(self, v, vrp, dv, log=np.log, i0=spsp.i0):
-        dv2 = dv*dv
-        return log(v/dv2) - 0.5*(v*v + vrp*vrp)/dv2 + log(i0(v*vrp/dv2))
-
-    def _argcheck(self,*args):
-        vrp,dv = args
-        return (vrp >= 0) & (dv > 0)
-
-    def _fitstart(self,data):
-        """ Rough starting fit parameters, based on ATLAS results. """
-
-        mean = data.mean()
-        std = data.std()
-        return np.sqrt(mean**2-std**2), std, 0, 1
+    if dist == 'rice':
+        from .rice import rice
+        return rice
 
-    def fit(self, data, *args, **kwargs):
-        """ Fit with fixed location and scale. """
+    import scipy.stats as spst
 
-        return super().fit(data,floc=0,fscale=1)[:2]
+    try:
+        dist = getattr(spst,dist)
+    except AttributeError:
+        raise ValueError('invalid distribution: ' + dist)
 
-spst.rice = rice_gen(a=0.0, name="rice", shapes="vrp,dv")
+    return dist
 
 
 class RawData:
@@ -191,13 +151,16 @@ class RawData:
         return self.data.mean(), self.data.std()
 
 
-    def ks(self,*args,**kwargs):
+    def ks(self,*args,grid=None,**kwargs):
         """
         Perform the Kolmogorov-Smirnov test for goodness of fit.
 
         Arguments
         ---------
         *args -- dist. parameters to test against
+        grid -- for the Rice distribution, interpolate the CDF on a cached grid
+                of this many points, see rice.interpolated_cdf; args must be
+                vrp,dv with optional loc = 0, scale = 1 [optional]
         **kwargs -- for scipy.stats.kstest
 
         Returns
@@ -206,7 +169,22 @@ class RawData:
 
         """
 
-        return spst.kstest(self.data,self.dist.name,args=args,**kwargs)
+        import scipy.stats as spst
+
+        cdf = self.dist.cdf
+
+        if grid:
+            if self.dist.name != 'rice':
+                raise ValueError('grid requires the rice distribution')
+            if len(args) < 2 or tuple(args[2:]) not in ((),(0,),(0,1)):
+                raise ValueError('grid requires rice parameters vrp,dv '
+                                 'with loc = 0, scale = 1')
+
+            from .rice import interpolated_cdf
+            cdf = partial(interpolated_cdf,points=grid)
+            args = args[:2]
+
+        return spst.kstest(self.data,cdf,args=args,**kwargs)
 
 
     def fit(self):
@@ -219,8 +197,11 @@ class RawData:
 
         """
 
-        if self.dist is spst.norm:
+        if self.dist.name == 'norm':
             return self.describe()
+        elif self.dist.name == 'gengamma':
+            from .gengamma import fit
+            return fit(self.data)
         else:
             return self.dist.fit(self.data)
 
@@ -228,13 +209,15 @@ class RawData:
     def plot(self):
         """ Fit and plot the data. """
 
+        plt = _pyplot()
+
         x = np.linspace(self.data.min(),self.data.max(),100)
 
         params = self.fit()
 
         plt.plot(x, self.dist.pdf(x, *params))
         plt.hist(self.data, bins=int(2*self.data.size**.33),
-                histtype='step', normed=True)
+                histtype='step', density=True)
 
         plt.show()
 
@@ -328,17 +311,17 @@ class BinnedData:
 
         """
 
-        if self.dist is spst.norm:
+        if self.dist.name == 'norm':
             return self.describe()
 
-        if self.dist is spst.gengamma:
+        if self.dist.name == 'gengamma':
             # fix location parameter to zero
             def f(x,*p):
                 return self.dist.pdf(x,p[0],p[1],0,p[-1])
 
-            p0 = self.dist._fitstart(self.x,self.y)
-            p0 = p0[:2] + p0[3:]
-        elif self.dist is spst.rice:
+            # flow distributions seem to consistently have rms ~ scale
+            p0 = 1., 2., rms(self.x,self.y)
+        elif self.dist.name == 'rice':
             f = self.dist.pdf
             mean, std = self.describe()
             p0 = np.sqrt(mean**2-std**2), std
@@ -351,10 +334,12 @@ class BinnedData:
         except TypeError:
             sigma = None
 
+        import scipy.optimize as spop
+
         popt, pcov = spop.curve_fit(f, self.x, self.y, p0=p0, sigma=sigma)
         popt = popt.tolist()
 
-        if self.dist is spst.gengamma:
+        if self.dist.name == 'gengamma':
             popt.insert(2,0)
 
         return tuple(popt)
@@ -363,6 +348,8 @@ class BinnedData:
     def plot(self):
         """ Fit and plot the data. """
 
+        plt = _pyplot()
+
         X = np.linspace(0,self.x.max(),100)
 
         params = self.fit()
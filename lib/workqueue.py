@@ -0,0 +1,357 @@
+"""
+Distribute aggregate analyses across batch jobs via a directory-based work
+queue on a shared filesystem.
+
+A queue is a directory containing
+
+    config.json -- the analysis and its settings
+    tasks/<id>.json -- one task per input file
+    leases/<id>.<n>.lease -- claims on tasks, the n-th attempt at each task
+    results/<id>.npz -- partial results, see lib.state
+    errors/<id>.txt -- tracebacks of failed tasks
+
+Workers claim a task by creating the next lease file for it exclusively (the
+filesystem guarantees only one worker succeeds), periodically touch the lease
+file while working (heartbeat), and write the partial result atomically.  A
+lease which has not been touched for longer than the timeout is considered
+expired, e.g. because its worker was pre-empted, and the task is re-issued as
+the next attempt.  Results are deterministic, so a late result from an expired
+lease is harmless.
+
+No state is kept outside the queue directory, so any number of workers may
+join or leave at any time.
+"""
+
+
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import traceback
+
+from . import state
+
+
+# available analyses
+ANALYSES = ['average','differential','cumulants','multiplicity']
+
+
+def run_task(config,files):
+    """
+    Run an analysis on a set of files.
+
+    Arguments
+    ---------
+    config -- dict of analysis settings, see WorkQueue.submit()
+    files -- list of filenames
+
+    Returns
+    -------
+    aggregate, see lib.state
+
+    """
+
+    from .ebeinput import events_from_files
+
+    events = events_from_files(files,config['inputformat'],columnar=True,
+                               jobs=config.get('jobs',1),**config['filters'])
+
+    analysis = config['analysis']
+    vnmin,vnmax = config['vn']
+
+    if analysis == 'multiplicity':
+        from .multiplicity import histogram
+        return histogram(events)
+
+    from . import flows
+
+    if analysis == 'average':
+        return flows.average(events,vnmin,vnmax)
+    elif analysis == 'differential':
+        return flows.differential(events,vnmin,vnmax,width=config['width'],
+                                  edges=config['edges'],
+                                  variable=config['variable'])
+    elif analysis == 'cumulants':
+        return flows.cumulants(events,vnmin,vnmax,width=config['width'],
+                               edges=config['edges'],
+                               variable=config['variable'])
+    else:
+        raise ValueError('unknown analysis: ' + analysis)
+
+
+def _write_atomic(filename,data):
+    # temporary file in the same directory, so that it can be renamed
+    fd,tmp = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+
+    with os.fdopen(fd,'w') as f:
+        f.write(data)
+
+    os.replace(tmp,filename)
+
+
+class WorkQueue:
+    """
+    A directory-based work queue.
+
+    Arguments
+    ---------
+    path -- queue directory
+    timeout -- seconds after which a lease without heartbeat expires
+               [optional, default 300]
+
+    """
+
+    def __init__(self,path,timeout=300):
+        self.path = path
+        self.timeout = timeout
+        self.worker = '{}.{}'.format(socket.gethostname(),os.getpid())
+
+
+    def _file(self,*parts):
+        return os.path.join(self.path,*parts)
+
+
+    def submit(self,files,**config):
+        """
+        Create the queue and register each file as a task.
+
+        Arguments
+        ---------
+        files -- list of input filenames
+        config -- analysis settings:
+            analysis -- one of ANALYSES
+            vn -- (vnmin,vnmax)
+            width,edges,variable -- bins, for differential and cumulants
+            inputformat -- as for events_from_files
+            filters -- dict of filtering criteria
+            jobs -- processes per task, as for events_from_files
+                    [optional, default 1]
+            precision -- significant digits of the merged output
+                         [optional, default shortest exact]
+
+        """
+
+        assert config['analysis'] in ANALYSES
+
+        for d in ('tasks','leases','results','errors'):
+            os.makedirs(self._file(d), exist_ok=True)
+
+        if os.path.exists(self._file('config.json')):
+            raise FileExistsError('queue already exists: ' + self.path)
+
+        # paths must be valid on any node
+        files = [os.path.abspath(f) for f in files]
+
+        for i,f in enumerate(files):
+            _write_atomic(self._file('tasks','{:06d}.json'.format(i)),
+                          json.dumps(dict(files=[f])))
+
+        # write the config last, so that workers do not start early
+        _write_atomic(self._file('config.json'),json.dumps(config))
+
+
+    def config(self):
+        """ Analysis settings. """
+
+        with open(self._file('config.json')) as f:
+            return json.load(f)
+
+
+    def tasks(self):
+        """ Sorted list of task IDs. """
+
+        return sorted(f[:-5] for f in os.listdir(self._file('tasks'))
+                      if f.endswith('.json'))
+
+
+    def _finished(self,task):
+        return os.path.exists(self._file('results',task+'.npz')) or \
+            os.path.exists(self._file('errors',task+'.txt'))
+
+
+    def _lease(self,task):
+        """
+        Return the attempt number of the latest lease on a task (0 if none)
+        and whether it is still active.
+
+        """
+
+        prefix = task + '.'
+        attempts = [int(f.split('.')[1]) for f in os.listdir(self._file('leases'))
+                    if f.startswith(prefix) and f.endswith('.lease')]
+
+        if not attempts:
+            return 0,False
+
+        n = max(attempts)
+
+        try:
+            age = time.time() - os.stat(self._leasefile(task,n)).st_mtime
+        except FileNotFoundError:
+            # released in the meantime
+            return n,False
+
+        return n,age < self.timeout
+
+
+    def _leasefile(self,task,n):
+        return self._file('leases','{}.{}.lease'.format(task,n))
+
+
+    def status(self):
+        """
+        Count tasks by status:  done, failed, running, expired, pending.
+
+        """
+
+        counts = dict.fromkeys(('done','failed','running','expired','pending'),0)
+
+        for task in self.tasks():
+            if os.path.exists(self._file('results',task+'.npz')):
+                counts['done'] += 1
+            elif os.path.exists(self._file('errors',task+'.txt')):
+                counts['failed'] += 1
+            else:
+                n,active = self._lease(task)
+                if active:
+                    counts['running'] += 1
+                elif n and os.path.exists(self._leasefile(task,n)):
+                    counts['expired'] += 1
+                else:
+                    counts['pending'] += 1
+
+        return counts
+
+
+    def claim(self):
+        """
+        Claim the first available task, i.e. a task which is not finished and
+        has no active lease.
+
+        Returns
+        -------
+        (task,leasefile) or None if no task is available
+
+        """
+
+        for task in self.tasks():
+            if self._finished(task):
+                continue
+
+            n,active = self._lease(task)
+            if active:
+                continue
+
+            leasefile = self._leasefile(task,n+1)
+
+            # exclusive creation fails if another worker got here first
+            try:
+                fd = os.open(leasefile, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+
+            with os.fdopen(fd,'w') as f:
+                f.write(self.worker + '\n')
+
+            # the task may have finished between the check and the claim
+            if self._finished(task):
+                os.remove(leasefile)
+                continue
+
+            return task,leasefile
+
+        return None
+
+
+    def _heartbeat(self,leasefile,stop):
+        # touch the lease file until stopped
+        while not stop.wait(self.timeout/4):
+            try:
+                os.utime(leasefile)
+            except FileNotFoundError:
+                break
+
+
+    def work(self,poll=None):
+        """
+        Process tasks until all are finished.  When all unfinished tasks are
+        leased by other workers, wait for them to finish or expire.
+
+        Arguments
+        ---------
+        poll -- seconds between checks for available tasks
+                [optional, default min(timeout/4, 10)]
+
+        Returns
+        -------
+        number of tasks processed by this worker
+
+        """
+
+        if poll is None:
+            poll = min(self.timeout/4, 10)
+
+        config = self.config()
+        ntasks = 0
+
+        while True:
+            claimed = self.claim()
+
+            if claimed is None:
+                if all(self._finished(t) for t in self.tasks()):
+                    return ntasks
+
+                time.sleep(poll)
+                continue
+
+            task,leasefile = claimed
+
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat,
+                                         args=(leasefile,stop), daemon=True)
+            heartbeat.start()
+
+            try:
+                with open(self._file('tasks',task+'.json')) as f:
+                    files = json.load(f)['files']
+
+                result = run_task(config,files)
+                state.save(result,self._file('results',task+'.npz'))
+
+            except Exception:
+                _write_atomic(self._file('errors',task+'.txt'),
+                              self.worker + '\n' + traceback.format_exc())
+
+            finally:
+                stop.set()
+                heartbeat.join()
+                os.remove(leasefile)
+
+            ntasks += 1
+
+
+    def result(self):
+        """
+        Merge the partial results of all finished tasks.
+
+        Returns
+        -------
+        aggregate and list of task IDs without results
+
+        """
+
+        missing = []
+        results = []
+
+        for task in self.tasks():
+            fn = self._file('results',task+'.npz')
+            if os.path.exists(fn):
+                results.append(fn)
+            else:
+                missing.append(task)
+
+        merged = state.merge(map(state.load,results)) if results else None
+
+        return merged,missing
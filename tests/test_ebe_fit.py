@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _ebe_fit(*args):
+    return subprocess.run([sys.executable,os.path.join(ROOT,'ebe-fit')] +
+                          [str(a) for a in args],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+
+
+def test_ks_grid(tmp_path):
+    rng = np.random.default_rng(1)
+    vrp,dv = .05,.03
+    v = np.hypot(vrp + dv*rng.standard_normal(5000),
+                 dv*rng.standard_normal(5000))
+
+    data = str(tmp_path / 'v.dat')
+    np.savetxt(data,v)
+
+    def ks(*args):
+        proc = _ebe_fit('rice',data,*args)
+        assert proc.returncode == 0, proc.stderr
+        return [float(x) for x in proc.stdout.split()]
+
+    exact = ks('-k',vrp,dv)
+
+    # loc and scale may be given; a coarse grid shows that it is used
+    for params in ((vrp,dv),(vrp,dv,0,1)):
+        assert np.allclose(ks('-g',2**14,'-k',*params), exact, atol=1e-6)
+        assert not np.allclose(ks('-g',8,'-k',*params), exact, atol=1e-6)
+
+    # the grid cannot be used with other loc, scale
+    proc = _ebe_fit('rice',data,'-g',2**14,'-k',vrp,dv,0,2)
+    assert proc.returncode == 2
+    assert '--grid' in proc.stderr
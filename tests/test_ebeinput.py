@@ -0,0 +1,55 @@
+import numpy as np
+
+from lib import pdg
+from lib.ebeinput import events_from_files, load_index, write_index
+from lib.ebeoutput import write_store
+from lib.particle import ParticleArray
+
+
+def _events(n=40,seed=1):
+    rng = np.random.default_rng(seed)
+    species = np.array([211,-211,111,2212,321,22])
+
+    for _ in range(n):
+        size = rng.integers(50,200)
+        yield ParticleArray(rng.choice(species,size),
+                            rng.exponential(.5,size),
+                            rng.uniform(-np.pi,np.pi,size),
+                            rng.normal(0,2,size))
+
+
+def test_store_charged(tmp_path):
+    path = str(tmp_path / 'store')
+    write_store(_events(),path,chunksize=8)
+
+    charged = np.fromiter(pdg.chargedIDs(), int)
+    expected = sum(np.isin(np.abs(e.ID),charged).sum() for e in _events())
+
+    for kwargs in (dict(charged=True), dict(charged=True,pTmin=.5)):
+        got = sum(len(e) for e in events_from_files(path,columnar=True,
+                                                    **kwargs))
+        if 'pTmin' in kwargs:
+            assert 0 < got < expected
+        else:
+            assert got == expected
+
+
+def test_index_format(tmp_path):
+    path = str(tmp_path / 'ev.dat')
+
+    with open(path,'w') as f:
+        for e in _events(10):
+            for p in zip(e.ID.tolist(),e.pT.tolist(),e.phi.tolist(),
+                         e.eta.tolist()):
+                f.write('{} {!r} {!r} {!r}\n'.format(*p))
+            f.write('\n')
+
+    expected = [len(e) for e in _events(10)][3:6]
+
+    # an index for another format must not be used
+    write_index(path,'oscar')
+
+    events = events_from_files(path,'std',columnar=True,events=slice(3,6))
+    assert [len(e) for e in events] == expected
+
+    assert load_index(path,'std')['format'] == 'std'
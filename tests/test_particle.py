@@ -0,0 +1,48 @@
+import numpy as np
+
+from lib.particle import Particle, ParticleArray, particle_filter
+
+
+def _event():
+    rng = np.random.default_rng(1)
+    size = 1000
+    return ParticleArray(rng.choice([211,-211,111,2212],size),
+                         rng.exponential(.5,size),
+                         rng.uniform(-np.pi,np.pi,size),
+                         rng.normal(0,2,size))
+
+
+def test_numpy_limits():
+    event = _event()
+    particles = [Particle(*p) for p in zip(event.ID.tolist(),
+                                           event.pT.tolist(),
+                                           event.phi.tolist(),
+                                           event.eta.tolist())]
+
+    expected = (event.pT > .5) & (np.abs(event.eta) < 1.)
+
+    for t in (np.float64,np.float32,float):
+        kwargs = dict(pTmin=t(.5), etamax=t(1.))
+
+        np.testing.assert_array_equal(
+            particle_filter(event,**kwargs).pT, event.pT[expected])
+
+        filtered = list(particle_filter(particles,**kwargs))
+        assert len(filtered) == expected.sum()
+
+
+def test_infinite_limits():
+    event = _event()
+    particles = list(zip(event.ID.tolist(),event.pT.tolist(),
+                         event.phi.tolist(),event.eta.tolist()))
+    particles = [Particle(*p) for p in particles]
+
+    for kwargs in (dict(pTmax=np.inf), dict(pTmin=.5,pTmax=float('inf')),
+                   dict(etamax=np.inf)):
+        expected = np.ones(len(event), dtype=bool)
+        if 'pTmin' in kwargs:
+            expected = event.pT > .5
+
+        assert len(particle_filter(event,**kwargs)) == expected.sum()
+        assert len(list(particle_filter(particles,**kwargs))) == \
+            expected.sum()
@@ -0,0 +1,33 @@
+import numpy as np
+import scipy.stats as spst
+
+from lib.rice import rice, interpolated_cdf
+from lib.stats import RawData
+
+
+PARAMS = [(.05,.03), (0.,.02), (.2,.01), (.01,.05)]
+
+
+def test_cdf():
+    for vrp,dv in PARAMS:
+        v = np.linspace(0, vrp + 8*dv, 201)
+        expected = spst.rice.cdf(v, vrp/dv, scale=dv)
+
+        np.testing.assert_allclose(rice.cdf(v,vrp,dv), expected,
+                                   rtol=1e-10, atol=1e-14)
+        np.testing.assert_allclose(interpolated_cdf(v,vrp,dv), expected,
+                                   atol=1e-7)
+
+
+def test_ks():
+    rng = np.random.default_rng(1)
+    vrp,dv = .05,.03
+    v = np.hypot(vrp + dv*rng.standard_normal(10000),
+                 dv*rng.standard_normal(10000))
+
+    exact = RawData(v).ks(vrp,dv)
+    interp = RawData(v).ks(vrp,dv,grid=2**14)
+    expected = spst.kstest(v, spst.rice.cdf, args=(vrp/dv,0,dv))
+
+    assert abs(exact[0] - expected[0]) < 1e-10
+    assert abs(interp[0] - expected[0]) < 1e-7